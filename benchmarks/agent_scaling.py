@@ -0,0 +1,82 @@
+# Description: Measures how the cost of MultiGridEnv.step() grows with the number of agents, from a
+# handful to a few hundred agents on a large generated map, and fits the scaling exponent k of
+# time per step ~ n_agents^k. Per-step cost should grow linearly (k close to 1), not quadratically.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.agent_scaling                      # both move modes, exit code 1 if k > --max-exponent
+#   python -m benchmarks.agent_scaling --counts 50 100 200 400 --output scaling.json
+
+import argparse
+import json
+import sys
+import numpy as np
+from mrl_grid.custom_envs.grid_env import MultiGridEnv, MOVE_MODES
+from mrl_grid.map_generator import generate_map
+from benchmarks.env_benchmark import bench_steps, environment_info
+
+AGENT_COUNTS = (10, 25, 50, 100, 200)
+MAP_SHAPE = (120, 120)
+OBSTACLE_DENSITY = 0.1
+VIEW_RADIUS = 2
+MAX_EXPONENT = 1.25 # linear scaling plus headroom for noise; quadratic scaling gives about 2
+
+def make_env(n_agents, move_mode, view_radius=VIEW_RADIUS, shape=MAP_SHAPE):
+    """An environment on an open map with obstacles and the agents spread out at random."""
+    grid_map = generate_map('obstacles', shape, seed=0, n_agents=n_agents, agent_placement='random',
+                            cache_dir=None, density=OBSTACLE_DENSITY)
+    env = MultiGridEnv(grid_map, view_radius, move_mode=move_mode)
+    env.test_mode = True # collisions do not end the episode
+    env.fps = None
+    env.reset()
+    return env
+
+def scaling_exponent(agent_counts, step_times):
+    """Return the slope of log(step time) against log(agent count), fitted by least squares."""
+    return float(np.polyfit(np.log(agent_counts), np.log(step_times), 1)[0])
+
+def run_scaling(agent_counts=AGENT_COUNTS, move_modes=MOVE_MODES, calls=100, repeats=5, log=print):
+    """
+    Time step() for every agent count and move mode.
+
+    Returns:
+        dict: {move mode: {'us_per_step': {n_agents: microseconds}, 'exponent': k}}.
+    """
+    results = {}
+    for move_mode in move_modes:
+        step_times = {}
+        for n_agents in agent_counts:
+            env = make_env(n_agents, move_mode)
+            step_times[n_agents] = 1e6 / bench_steps(env, calls, repeats)
+            env.close()
+            log(f"{move_mode:<13} {n_agents:>5} agents {step_times[n_agents]:>10.0f} us/step "
+                f"{step_times[n_agents] / n_agents:>8.1f} us/agent")
+        exponent = scaling_exponent(list(step_times), list(step_times.values()))
+        log(f"{move_mode:<13} scaling exponent {exponent:.2f}")
+        results[move_mode] = {'us_per_step': step_times, 'exponent': exponent}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark how MultiGridEnv.step() scales with the number of agents.")
+    parser.add_argument("--counts", type=int, nargs="+", default=AGENT_COUNTS, help="agent counts to time")
+    parser.add_argument("--move-mode", choices=MOVE_MODES, help="only time this move mode")
+    parser.add_argument("--max-exponent", type=float, default=MAX_EXPONENT,
+                        help="largest scaling exponent accepted (default: %(default)s)")
+    parser.add_argument("--quick", action="store_true", help="time fewer steps, for a rough check")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    move_modes = [args.move_mode] if args.move_mode else MOVE_MODES
+    calls, repeats = (20, 3) if args.quick else (100, 5)
+    results = run_scaling(sorted(args.counts), move_modes, calls, repeats)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'environment': environment_info(), 'results': results}, f, indent=2)
+
+    superlinear = [mode for mode, result in results.items() if result['exponent'] > args.max_exponent]
+    for mode in superlinear:
+        print(f"SUPERLINEAR {mode}: step time grows as n_agents^{results[mode]['exponent']:.2f}")
+    sys.exit(1 if superlinear else 0)
+
+if __name__ == "__main__":
+    main()
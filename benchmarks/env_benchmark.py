@@ -0,0 +1,251 @@
+# Description: Throughput benchmarks for MultiGridEnv. Measures reset(), step() early and late in an
+# episode, whole episodes, _get_obs() and rendering across maps, agent counts and view radii. Results
+# are written to JSON and can be compared against a stored baseline to flag regressions.
+#
+# Usage (from the repository root):
+#   python -m benchmarks.env_benchmark                                  # compare with benchmarks/baseline.json
+#   python -m benchmarks.env_benchmark --output results.json --threshold 0.2
+#   python -m benchmarks.env_benchmark --update-baseline                # store the results as the new baseline
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+import matplotlib
+from mrl_grid.custom_envs.grid_env import MultiGridEnv
+import mrl_grid.maps as maps
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+THRESHOLD = 0.2 # relative slowdown flagged as a regression
+
+# (map group, map name) pairs covering one, two and three agents and growing map sizes
+MAPS = [
+    ('SINGLE_AGENT_MAPS', '10x10'),
+    ('SINGLE_AGENT_MAPS', '15x15'),
+    ('TWO_AGENT_MAPS', '5x5'),
+    ('THREE_AGENT_MAPS', '9x9 Room1'),
+    ('THREE_AGENT_MAPS', '16x20 Room1'),
+    ('THREE_AGENT_MAPS', '16x27 Room1'),
+]
+VIEW_RADII = (1, 3)
+TRAVERSAL_LIMIT_FACTORS = (1, 4) # short and long episodes
+LATE_COVERAGE = 0.9 # fraction of cells covered before late-episode steps are timed
+
+def make_env(grid_map, view_radius, traversal_limit_factor=None):
+    env = MultiGridEnv(grid_map, view_radius, traversal_limit_factor)
+    env.test_mode = True # collisions do not end the episode
+    env.fps = None
+    env.reset()
+    return env
+
+def measure(function, calls, repeats, setup=None):
+    """
+    Return the best rate, in calls per second, over several timed blocks of calls. Other load on
+    the machine only ever slows a block down, so the fastest block is the most repeatable estimate.
+    If given, setup() is called untimed before each block.
+    """
+    if setup:
+        setup()
+    function() # warm up
+    best = float('inf')
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return calls / best
+
+def random_actions(env, n, seed=0):
+    return np.random.default_rng(seed).integers(0, env.nA, size=(n, env.n_agents))
+
+def bench_reset(env, calls, repeats):
+    return measure(env.reset, calls, repeats)
+
+def bench_steps(env, calls, repeats, late=False):
+    """Steps per second from a fresh episode, or from one where most cells have been covered."""
+    env.reset()
+    if late:
+        actions = random_actions(env, 100_000, seed=1)
+        for action in actions:
+            env.step(action)
+            if env.world.seen_count >= LATE_COVERAGE * env.world.cells:
+                break
+    # every block replays the same actions from the same state
+    start_state = env.get_state()
+    actions = random_actions(env, calls + 1)
+    remaining = iter(())
+
+    def setup():
+        nonlocal remaining
+        env.set_state(start_state)
+        remaining = iter(actions)
+
+    def step():
+        env.step(next(remaining))
+
+    return measure(step, calls, repeats, setup)
+
+def bench_episodes(env, steps, repeats):
+    """Steps per second over whole episodes, including the resets between them."""
+    actions = iter(random_actions(env, steps * repeats + 1))
+
+    def step():
+        _, _, done, _ = env.step(next(actions))
+        if done:
+            env.reset()
+
+    env.reset()
+    return measure(step, steps, repeats)
+
+def bench_obs(env, calls, repeats):
+    bench_steps(env, 50, 1) # some coverage, so observations are not all empty
+    return measure(env._get_obs, calls, repeats)
+
+def bench_rgb_array(env, calls, repeats):
+    env.reset()
+    actions = iter(random_actions(env, calls * repeats + 1))
+
+    def frame():
+        env.step(next(actions))
+        env.render('rgb_array')
+
+    return measure(frame, calls, repeats)
+
+def bench_window(env, calls, repeats):
+    env.reset()
+    env.render() # the first frame creates the window and draws everything
+    actions = iter(random_actions(env, calls * repeats + 1))
+
+    def frame():
+        env.step(next(actions))
+        env.render()
+
+    rate = measure(frame, calls, repeats)
+    env.close()
+    env.window = None
+    return rate
+
+def run_round(scale=1.0, render_window=True):
+    """Run every benchmark once and return the results as {case name: calls per second}."""
+    def n(calls):
+        return max(1, int(calls * scale))
+
+    results = {}
+    for group, name in MAPS:
+        grid_map = getattr(maps, group)[name]
+        map_case = f"{group.split('_')[0].lower()}/{name}"
+        for view_radius in VIEW_RADII:
+            env = make_env(grid_map, view_radius)
+            case = f"{map_case}/r{view_radius}"
+            results[f"reset/{case}"] = bench_reset(env, n(100), 5)
+            results[f"step_early/{case}"] = bench_steps(env, n(50), 5)
+            results[f"step_late/{case}"] = bench_steps(env, n(50), 5, late=True)
+            results[f"get_obs/{case}"] = bench_obs(env, n(500), 5)
+            env.close()
+
+            for factor in TRAVERSAL_LIMIT_FACTORS:
+                env = make_env(grid_map, view_radius, factor)
+                results[f"episodes/{case}/limit{factor}"] = bench_episodes(env, n(200), 5)
+                env.close()
+
+        env = make_env(grid_map, 1)
+        results[f"render_rgb_array/{map_case}"] = bench_rgb_array(env, n(50), 5)
+        if render_window:
+            results[f"render_window/{map_case}"] = bench_window(env, n(10), 2)
+        env.close()
+    return results
+
+def run_benchmarks(rounds=3, scale=1.0, render_window=True, log=print):
+    """
+    Run the benchmarks and return the results as {case name: calls per second}.
+
+    The whole suite is run several times and the best rate of each case is kept, so every case
+    is sampled at different moments and a burst of load on the machine does not skew it.
+
+    Parameters:
+        rounds (int): the number of times to run the suite.
+        scale (float): multiplies the number of timed calls, e.g. 0.1 for a quick run.
+        render_window (bool): whether to benchmark the Matplotlib renderer, which is slow.
+        log (callable): called with a line for every case once all rounds are done.
+    """
+    results = {}
+    for _ in range(rounds):
+        for name, rate in run_round(scale, render_window).items():
+            results[name] = max(rate, results.get(name, 0))
+    for name, rate in results.items():
+        log(f"{name:<55} {rate:>12,.0f} /s")
+    return results
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Compare results against a baseline and return the regressed cases as a list of
+    (case name, baseline rate, current rate) for rates that dropped by more than the threshold.
+    """
+    regressions = []
+    for name, rate in results.items():
+        base = baseline.get(name)
+        if base is not None and rate < base * (1 - threshold):
+            regressions.append((name, base, rate))
+    return regressions
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MultiGridEnv throughput.")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="the baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="relative slowdown that counts as a regression (default: %(default)s)")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--rounds", type=int, default=3, help="number of times to run the suite (default: %(default)s)")
+    parser.add_argument("--quick", action="store_true", help="time fewer calls in a single round, for a rough check")
+    parser.add_argument("--no-window", action="store_true", help="skip the slow Matplotlib renderer benchmarks")
+    args = parser.parse_args()
+
+    matplotlib.use('Agg')
+    if args.quick:
+        results = run_benchmarks(rounds=1, scale=0.1, render_window=not args.no_window)
+    else:
+        results = run_benchmarks(args.rounds, render_window=not args.no_window)
+    report = {'environment': environment_info(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+
+    regressions = compare(results, baseline, args.threshold)
+    print()
+    for name, base, rate in regressions:
+        print(f"REGRESSION {name}: {rate:,.0f} /s vs {base:,.0f} /s baseline ({rate / base - 1:+.0%})")
+    missing = sorted(set(baseline) - set(results))
+    if missing:
+        print(f"{len(missing)} baseline cases were not run")
+    print(f"{len(regressions)} regressions beyond {args.threshold:.0%} in {len(results)} cases")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
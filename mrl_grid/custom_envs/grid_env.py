@@ -1,16 +1,44 @@
+import copy
+from time import perf_counter, time
 import gym.spaces
 import numpy as np
 from mrl_grid.render import WorldRenderer
-from mrl_grid.world import World, Wall, Agent
-from mrl_grid.reward_functions import (get_illegal_move_reward, get_collision_reward, get_new_cell_reward,
-                              get_seen_cell_reward, get_movement_cost, get_wait_cost,
-                              get_exploration_reward, get_revisit_penalty, get_adjacent_seen_cell_reward)
+from mrl_grid.raster import GridRasterizer, PIXELS_PER_CELL
+from mrl_grid.recorder import EpisodeRecorder
+from mrl_grid.metrics import MetricsSink
+from mrl_grid.profiling import PerfStats
+from mrl_grid.world import World, MapTemplate, ACTION_DELTAS, SELF_CHANNEL
+from mrl_grid.observation import ObservationBuilder
+from mrl_grid.env_state import EnvState
+from mrl_grid.reward_engine import RewardEngine, MoveEvents, DEFAULT_REWARD_TERMS
 
 FPS = 20 # frames per second for rendered environment
+INFO_LEVELS = ('none', 'compact', 'full')
+MOVE_MODES = ('sequential', 'simultaneous')
+# Fields of the step and episode records logged to a metrics sink. Step records hold the values of one
+# step, episode records the totals of the episode; fields that do not apply are left out.
+METRICS_FIELDS = ('type', 'time', 'episode', 'steps', 'reward', 'coverage', 'collisions', 'done',
+                  'traversal_limit_reached', 'completed')
+
+def info_dtype(n_agents):
+    """Return the fixed layout of the compact info record returned with info_level='compact'."""
+    return np.dtype([
+        ('total_coverage', np.int64),
+        ('collision', bool),
+        ('traversal_limit_reached', bool),
+        ('coverage', np.int64, (n_agents,)),
+        ('steps_taken', np.int64, (n_agents,)),
+    ])
 
 class MultiGridEnv(gym.Env):
     """A multi-agent environment class for gridworld navigation task with partial observability."""
-    def __init__(self, grid_map: list[list[int]], view_radius: int, traversal_limit_factor: float = None):
+    metadata = {"render_modes": ["human", "image", "rgb_array"]}
+
+    def __init__(self, grid_map: list[list[int]], view_radius: int, traversal_limit_factor: float = None,
+                 record_trails: bool = True, info_level: str = 'full', reward_terms: tuple = DEFAULT_REWARD_TERMS,
+                 reward_weights: dict = None, move_mode: str = 'sequential', profiling: bool = False,
+                 exploration_radius: int = None, obs_dtype: str = 'float32', obs_layout: str = 'channels_last',
+                 obs_packed: bool = False):
         """
         Parameters:
             grid_map (list[list[int]]): a list of lists containing integers that represent the grid world. The integers
@@ -19,7 +47,27 @@ class MultiGridEnv(gym.Env):
             view_radius (int): the radius of the agent's observation area.
             traversal_limit_factor (float): a factor that determines the maximum number of cells an agent can visit before
                                             the episode terminates. If None, there is no traversal limit.
+            record_trails (bool): whether to record the trail of every agent move. Trails are only used for rendering,
+                                  so they can be turned off when nothing will be rendered.
+            info_level (str): how much information step() returns: 'none' for an empty dict, 'compact' for a NumPy
+                              record with the layout of info_dtype(n_agents), or 'full' for a dict with a entry per agent.
+            reward_terms (tuple[str]): the names of the reward terms to enable, from those registered in reward_engine.
+            reward_weights (dict): optional weights by term name that override REWARD_MAP.
+            move_mode (str): 'sequential' moves agents one after the other in agent order, so each agent sees the
+                             moves already made by the agents before it. 'simultaneous' resolves all moves together.
+            profiling (bool): whether to time the phases of step(), reset() and render(). The timings are returned
+                              by perf_stats(). The attribute can be switched at any time.
+            exploration_radius (int): the radius of the window the 'exploration' reward term counts unexplored cells
+                                      in. It may be larger than view_radius. If None, view_radius is used.
+            obs_dtype (str): the dtype of observations: 'float32', 'float64', 'int8' or 'uint8'. uint8 stores the
+                             value -1 of cells outside the grid as 255.
+            obs_layout (str): 'channels_last' for observations of shape (n_agents, 2r+1, 2r+1, 4) or 'channels_first'
+                              for (n_agents, 4, 2r+1, 2r+1).
+            obs_packed (bool): whether to pack the channels of each cell into the bits of one uint8, giving
+                               observations of shape (n_agents, 2r+1, 2r+1). See observation.unpack_observation().
         """
+        assert info_level in INFO_LEVELS, f"info_level must be one of {INFO_LEVELS}"
+        assert move_mode in MOVE_MODES, f"move_mode must be one of {MOVE_MODES}"
 
         self.test_mode = False # Check if test mode is on
             
@@ -30,100 +78,70 @@ class MultiGridEnv(gym.Env):
 
         self.view_radius = view_radius
         self.traversal_limit_factor = traversal_limit_factor
+        self.record_trails = record_trails
+        self.move_mode = move_mode
         self.visited_counter = 0 # count number of times agent has visited a cell in a row
+        self.obs_builder = ObservationBuilder(self.view_radius, obs_dtype, obs_layout, obs_packed)
+        self.obs_buffer = None # array that step() and reset() write observations into, if set
+        self.template = MapTemplate(self.grid_map, padding=self.view_radius)
 
         self.world = self._initialise_world()
         self.n_agents = len(self.world.agents)
 
+        # Information returned by step()
+        self.info_level = info_level
+        self.info_dtype = info_dtype(self.n_agents)
+        self.agent_names = [f"Agent {agent.agent_id}" for agent in self.world.agents]
+        if self.traversal_limit_factor:
+            self.traversal_limit = round(self.traversal_limit_factor * self.template.cells)
+        else:
+            self.traversal_limit = None
+
         self.shared_reward = False
         self.goal_reward_assigned = False
+        self.reward_engine = RewardEngine(reward_terms, reward_weights)
+        self.exploration_radius = view_radius if exploration_radius is None else exploration_radius
+        self.move_events = MoveEvents(self.n_agents, self.view_radius, self.exploration_radius)
 
         self.nA = 5 # no of actions (up, down, left, right, wait)
         self.action_space = gym.spaces.MultiDiscrete([self.nA] * self.n_agents)
 
-        self.observation_space = gym.spaces.Box(
-            low=0,
-            high=1,
-            shape=(self.n_agents, 2 * self.view_radius + 1, 2 * self.view_radius + 1, self.channels),
-            dtype=np.float32
-        )
+        self.observation_space = self.obs_builder.space(self.n_agents)
+
+        # Profiling
+        self.profiling = profiling
+        self.profiler = PerfStats()
 
         # Rendering
         self.window = None
         self.fps = FPS
+        self.rasterizer = None
+        self.pixels_per_cell = PIXELS_PER_CELL # size of a grid cell in rgb_array frames
+        self.render_trails = True # whether rgb_array frames show trails
+        self.recorder = None
+
+        # Metrics
+        self.metrics = None
+        self.log_step_metrics = False
+        self.episode_index = -1
+        self.episode_steps = 0
+        self.episode_reward = 0.0
+        self.episode_collisions = 0
+        self.new_episode = True # set by reset(); the next logged step starts the episode totals
+        self.episode_ended = False # whether the episode record has been logged
 
     def _initialise_world(self):
-        """Initialize the world object based on the grid map."""
-        world = World(self.rows, self.cols)
-
-        num_agents = 0
-        for row in range(self.rows):
-            for col in range(self.cols):
-                pos = (col, row)
-
-                # Initialise agents in grid
-                if self.grid_map[col, row] == 1:
-                    agent_id = num_agents
-                    agent = Agent(agent_id, pos)
-                    agent.collided = False
-                    world.agents.append(agent)
-                    num_agents += 1
-                    world.cells += 1
-
-                    # mark cell on grid as visited
-                    world.cell_visited(pos, agent)
-
-                # Initialise walls in grid
-                if self.grid_map[col, row] == 2:
-                    wall = Wall(pos)
-                    world.walls.append(wall)
-                
-                if self.grid_map[col, row] == 0:
-                    world.cells += 1
-
-        return world
+        """Initialize the world object from the compiled map template."""
+        return World.from_template(self.template)
     
-    def _get_obs(self, agent):
-        """Get the observation/state for a given agent."""
-        x, y = agent.pos
-
-        # Initialize the observation array with the agent's view size
-        obs = np.zeros((2 * self.view_radius + 1, 2 * self.view_radius + 1, self.channels))
-
-        # Iterate over the agent's view area
-        for i in range(-self.view_radius, self.view_radius + 1):
-            for j in range(-self.view_radius, self.view_radius + 1):
-                # Calculate the world coordinates for the current cell in the agent's view
-                world_x, world_y = x + i, y + j
-
-                # Check if the current cell is outside the world's bounds
-                if not (0 <= world_y < self.world.rows and 0 <= world_x < self.world.cols):
-                    # Set the corresponding observation value to -1 for cells outside the world
-                    obs[self.view_radius + i, self.view_radius + j, :] = -1
-                    continue
-
-                # Check if the current cell is visited by any agent
-                if (world_x, world_y) in [cell.pos for cell in self.world.seen_cells]:
-                    # Set the corresponding observation value to 1 in channel 1 (Visited cells)
-                    obs[self.view_radius + i, self.view_radius + j, 1] = 1
-
-                # Check if the current cell contains a wall
-                if (world_x, world_y) in [wall.pos for wall in self.world.walls]:
-                    # Set the corresponding observation value to 1 in the new channel (channel 3)
-                    obs[self.view_radius + i, self.view_radius + j, 3] = 1
-
-                # Iterate over all agents in the world
-                for a in self.world.agents:
-                    # Check if an agent is in the current cell
-                    if a.pos == (world_x, world_y):
-                        # If it's the current agent, set the observation value to 1 in channel 0
-                        if a == agent:
-                            obs[self.view_radius + i, self.view_radius + j, 0] = 1
-                        # If it's another agent, set the observation value to 1 in channel 2
-                        else:
-                            obs[self.view_radius + i, self.view_radius + j, 2] = 1
-
-        return obs
+    def _get_obs(self, agent=None, out=None):
+        """
+        Get the observation/state for a given agent, or the stacked observations of all agents
+        with the shape of observation_space if no agent is given, written into out if given.
+        """
+        if agent is None:
+            return self.obs_builder.build(self.world, out=out)
+        return self.obs_builder.build(self.world, [self.world.agent_grid[agent.pos]])[0]
     
     def action_conversion(self, action_n):
         """Convert the list of actions for each agent into a single list."""
@@ -133,9 +151,36 @@ class MultiGridEnv(gym.Env):
         return action
 
     def get_centralized_state(self, state):
-        """Convert the list of observations for each agent into a centralized state."""
+        """
+        Convert the list of observations for each agent into a centralized state. For the state of
+        the whole map, use get_global_state().
+        """
         return np.concatenate(state, axis=1)
     
+    def get_global_state(self, agent=None, out=None):
+        """
+        Return the state of the whole map, shape (cols, rows, 4), with the channels of the observations
+        (self, visited, agents, wall) as int8 values 0 and 1.
+
+        Without arguments this is a read-only view of the world tensor: it costs no copy and follows
+        the environment as it steps and resets, with the self channel left at 0.
+
+        Parameters:
+            agent (int): the index of an agent to mark in the self channel. This needs a copy of the state.
+            out (np.ndarray): an array of shape (cols, rows, 4) to copy the state into, of any numeric dtype.
+        """
+        world = self.world
+        if agent is None and out is None:
+            return world.state_view
+        if out is None:
+            out = world.state_view.copy()
+        else:
+            np.copyto(out, world.state_view)
+        if agent is not None:
+            x, y = world.positions[agent]
+            out[x, y, SELF_CHANNEL] = 1
+        return out
+
     def get_centralized_reward(self, reward_n):
         """Calculate the total reward for all agents in the cooperative setting."""
         return np.sum(reward_n)
@@ -147,18 +192,21 @@ class MultiGridEnv(gym.Env):
             
     def step(self, action_n):
         """Take a step in the environment."""
+        perf = self.profiler if self.profiling else None
+        if perf: step_start = start = perf_counter()
+
         assert len(action_n) == len(self.world.agents)
         action = self.action_conversion(action_n)
-        done = False
-        # set action for each agent
-        reward_n = []
-        for i, agent in enumerate(self.world.agents):
-            agent.steps_taken += 1
-            new_pos = agent.get_new_pos(action[i])
-            reward, updated_pos, done = self._get_reward(agent, new_pos, done)
-            reward_n.append(reward)
-            self.world.add_trail(agent.pos, updated_pos, agent)
-            agent.pos = updated_pos
+        events, done, trails = self._move_agents(action)
+        if perf: start = perf.lap('step.move', start)
+        if self.record_trails:
+            world = self.world
+            for old_pos, new_pos, agent in trails:
+                world.add_trail(old_pos, new_pos, agent)
+            if perf: start = perf.lap('step.trails', start)
+
+        # Evaluate the enabled reward terms for all agents at once
+        reward_n = self.reward_engine.evaluate(events, self.world)
 
         # all agents get total reward in cooperative case
         reward = self.get_centralized_reward(reward_n)
@@ -166,105 +214,314 @@ class MultiGridEnv(gym.Env):
             reward_n = self.reward_conversion(reward)
 
         # Check if traversal limit has been reached
-        if self.traversal_limit_factor and self.traversal_limit_factor != 0:
-            traversal_limit = round(self.traversal_limit_factor * self.world.cells)
-            if self.visited_counter >= traversal_limit:
-                done = True
+        if self.traversal_limit_reached():
+            done = True
+        if perf: start = perf.lap('step.reward', start)
 
-        # Compute next observations for each agent
-        state_n = []
-        for agent in self.world.agents:
-            state_n.append(self._get_obs(agent))
-        state = np.stack(state_n, axis=0)
+        # Compute next observations for all agents at once
+        state = self._get_obs(out=self.obs_buffer)
+        if perf: start = perf.lap('step.obs', start)
         info = self._get_info()
+        if perf: start = perf.lap('step.info', start)
+        if self.recorder:
+            self.recorder.capture(self)
+            if perf: start = perf.lap('step.recording', start)
+        if self.metrics:
+            self._log_metrics(reward, done)
+            if perf: start = perf.lap('step.metrics', start)
+        if perf: perf.add('step', start - step_start)
         return state, reward, done, info
 
-    def _get_reward(self, agent, new_pos, done):
-        reward = 0
-        updated_pos = new_pos
+    def _move_agents(self, action):
+        """
+        Move the agents according to the move mode and record the outcome of each move in
+        `self.move_events`. Returns the events, whether the episode is done, and the trails to
+        record as (old position, new position, agent), empty unless `record_trails` is set.
+        """
+        if self.move_mode == 'simultaneous':
+            return self._move_agents_simultaneous(action)
+        return self._move_agents_sequential(action)
+
+    def _move_agents_sequential(self, action):
+        """Move the agents one after the other in agent order."""
+        world = self.world
+        events = self.move_events
+        events.clear()
+        done = False
+        trails = []
 
-        # Check for illegal moves (outside the grid boundary)
-        illegal_reward, illegal_move = get_illegal_move_reward(new_pos, self.world.cols, self.world.rows)
-        if illegal_move:
-            reward += illegal_reward
-            updated_pos = agent.pos
-        else:
-            # Check for collisions with other agents or walls
-            collision_reward, collision_occurred, done = get_collision_reward(agent, new_pos, done, self.world, self.test_mode)
-            if collision_occurred:
-                reward += collision_reward
-                updated_pos = agent.pos
+        for i, agent in enumerate(world.agents):
+            world.agent_stepped(agent)
+            new_pos = agent.get_new_pos(action[i])
+            events.old_pos[i] = events.new_pos[i] = agent.pos
+
+            # Check for illegal moves (outside the grid boundary)
+            if not world.in_bounds(new_pos):
+                events.illegal[i] = True
+                continue
+
+            # Check for collisions with other agents or walls (waiting collides with the agent itself)
+            other_agent = world.check_agent(new_pos)
+            if other_agent or world.check_wall(new_pos):
+                events.collision[i] = True
+                world.set_collided(agent)
+                if other_agent:
+                    world.set_collided(other_agent)
+                if not self.test_mode:
+                    done = True
+                continue
+
+            # Check for moving to a new cell and update the visited state
+            if world.is_cell_visited(new_pos):
+                events.revisits[i] = world.cell_revisited(new_pos)
             else:
-                # Check for moving to a new cell and update the visited state
-                new_cell_reward, done, self.visited_counter, self.goal_reward_assigned = get_new_cell_reward(agent, new_pos, done, self.world, self.visited_counter, self.goal_reward_assigned)
-                reward += new_cell_reward
-
-                # Check for moving to a previously seen cell
-                seen_cell_reward, self.visited_counter = get_seen_cell_reward(agent, new_pos, self.world, self.visited_counter)
-                if self.world.is_cell_visited(new_pos):
-                    # Update 2: Penalize revisiting a cell
-                    # revisit_penalty = get_revisit_penalty(new_pos)
-                    # seen_cell_reward += revisit_penalty
-                    pass
-                reward += seen_cell_reward
-
-                # Calculate movement cost
-                movement_cost = get_movement_cost(agent, new_pos)
-                reward += movement_cost
-
-                # Calculate wait cost (if agent remains in the same position)
-                wait_cost = get_wait_cost(agent, new_pos)
-                reward += wait_cost
-
-                # Update 1: Encourage the agent to move towards areas with more unexplored cells
-                # exploration_reward = get_exploration_reward(agent, new_pos, self.world, self.view_radius)
-                # reward += exploration_reward
-
-                # Update 3: Reward for moving to an empty cell next to a seen cell, wall, or boundary
-                adjacent_cell_reward = get_adjacent_seen_cell_reward(agent, new_pos, self.world)
-                reward += adjacent_cell_reward
-
-        return reward, updated_pos, done
+                events.new_cell[i] = True
+                world.cell_visited(new_pos, agent)
+                self.visited_counter = 0
+
+                if world.all_cells_visited():
+                    if not self.goal_reward_assigned:
+                        events.goal[i] = True
+                        self.goal_reward_assigned = True
+                    done = True
+            self.visited_counter += 1
+
+            events.moved[i] = True
+            events.new_pos[i] = new_pos
+            if self.record_trails:
+                trails.append((agent.pos, new_pos, agent))
+            world.move_agent(agent, new_pos)
+
+        return events, done, trails
+
+    def _move_agents_simultaneous(self, action):
+        """
+        Move all agents at once. Proposed positions are resolved together with array operations:
+        moves outside the grid are illegal, and moves into a wall, onto the same cell as another
+        move, swapping places with another agent, or into the cell of an agent that does not move
+        are collisions. Waiting is a legal move that keeps the agent in place.
+        """
+        world = self.world
+        events = self.move_events
+        events.clear()
+        done = False
+        world.agents_stepped()
+
+        pos = world.positions.copy()
+        target = pos + ACTION_DELTAS[np.asarray(action, dtype=np.intp)]
+        x, y = target[:, 0], target[:, 1]
+        illegal = ~((0 <= x) & (x < world.cols) & (0 <= y) & (y < world.rows))
+        target[illegal] = pos[illegal]
+        x, y = target[:, 0], target[:, 1]
+
+        waiting = ~illegal & np.all(target == pos, axis=1)
+        wall = ~illegal & world.wall_mask[x, y]
+        moving = ~(illegal | waiting | wall)
+        collision = wall.copy()
+
+        # Several agents moving onto the same cell
+        movers = np.flatnonzero(moving)
+        _, inverse, counts = np.unique(x[movers] * world.rows + y[movers], return_inverse=True, return_counts=True)
+        conflict = movers[counts[inverse.ravel()] > 1]
+        collision[conflict] = True
+        moving[conflict] = False
+
+        # Two agents swapping places
+        occupant = world.agent_grid[x, y].astype(np.intp)
+        occupied = occupant >= 0
+        swap = moving & occupied & moving[occupant] & np.all(target[occupant] == pos, axis=1)
+        collision |= swap
+        moving &= ~swap
+
+        # Moving into the cell of an agent that stays, repeated as blocked agents stay in turn
+        struck = np.zeros_like(moving)
+        blocked = moving & occupied & ~moving[occupant]
+        while blocked.any():
+            struck[occupant[blocked]] = True
+            collision |= blocked
+            moving &= ~blocked
+            blocked = moving & occupied & ~moving[occupant]
+
+        for i in np.flatnonzero(collision | struck).tolist():
+            world.set_collided(world.agents[i])
+        if collision.any() and not self.test_mode:
+            done = True
+
+        # Carry out the remaining moves
+        movers = np.flatnonzero(moving)
+        new_cell = moving & (world.visited_by[x, y] < 0)
+        trails = []
+        for i in movers.tolist():
+            new_pos = tuple(target[i].tolist())
+            if self.record_trails:
+                trails.append((world.agents[i].pos, new_pos, world.agents[i]))
+            if not new_cell[i]:
+                events.revisits[i] = world.cell_revisited(new_pos)
+        world.move_agents(movers, target[movers])
+
+        new_cells = np.flatnonzero(new_cell)
+        for i in new_cells.tolist():
+            agent = world.agents[i]
+            world.cell_visited(agent.pos, agent)
+
+        # Agents count towards the traversal limit in agent order, restarting at the last new cell
+        if len(new_cells):
+            self.visited_counter = int(np.count_nonzero(movers >= new_cells[-1]))
+            if world.all_cells_visited():
+                if not self.goal_reward_assigned:
+                    events.goal[new_cells[0]] = True
+                    self.goal_reward_assigned = True
+                done = True
+        else:
+            self.visited_counter += len(movers)
+
+        events.old_pos[:] = pos
+        events.new_pos[:] = np.where(moving[:, None], target, pos)
+        events.illegal[:] = illegal
+        events.collision[:] = collision
+        events.moved[:] = ~(illegal | collision)
+        events.new_cell[:] = new_cell
+        return events, done, trails
+
+    def reward_breakdown(self):
+        """Return the weighted value of each enabled reward term for every agent in the last step."""
+        return self.reward_engine.get_breakdown()
     
+    def _log_metrics(self, reward, done):
+        """
+        Queue the record of this step, if step records are enabled, and of the episode when it ends.
+        Steps taken after the episode has ended, without a reset, are not logged.
+        """
+        if self.new_episode:
+            self.new_episode = False
+            self.episode_ended = False
+            self.episode_index += 1
+            self.episode_steps = 0
+            self.episode_reward = 0.0
+            self.episode_collisions = 0
+        elif self.episode_ended:
+            return
+        collisions = int(np.count_nonzero(self.move_events.collision))
+        self.episode_steps += 1
+        self.episode_reward += reward
+        self.episode_collisions += collisions
+        world = self.world
+        coverage = world.seen_count / world.cells * 100
+        if self.log_step_metrics:
+            self.metrics.log({'type': 'step', 'time': time(), 'episode': self.episode_index, 'steps': self.episode_steps,
+                              'reward': reward, 'coverage': coverage, 'collisions': collisions, 'done': done})
+        if done:
+            self.episode_ended = True
+            self.metrics.log({'type': 'episode', 'time': time(), 'episode': self.episode_index,
+                              'steps': self.episode_steps, 'reward': self.episode_reward, 'coverage': coverage,
+                              'collisions': self.episode_collisions,
+                              'traversal_limit_reached': self.traversal_limit_reached(),
+                              'completed': world.all_cells_visited()})
+
+    def traversal_limit_reached(self):
+        """Check if the agents have revisited cells more times in a row than the traversal limit allows."""
+        return self.traversal_limit is not None and self.visited_counter >= self.traversal_limit
+
     def _get_info(self):
-        """Return the information about the environment."""
-        overall_coverage, individual_coverage = self.world.get_coverage()
-        steps_taken = self.world.get_steps_taken()
+        """Return the information about the environment at the configured info level."""
+        if self.info_level == 'none':
+            return {}
+
+        world = self.world
+        overall_coverage = round((world.seen_count / world.cells) * 100)
+        individual_coverage = np.round((world.cells_covered / world.cells) * 100)
+
+        if self.info_level == 'compact':
+            info = np.zeros((), dtype=self.info_dtype)
+            info['total_coverage'] = overall_coverage
+            info['collision'] = world.collided.any()
+            info['traversal_limit_reached'] = self.traversal_limit_reached()
+            info['coverage'] = individual_coverage
+            info['steps_taken'] = world.steps_taken
+            return info
 
         info = {
             "total_coverage": overall_coverage,
-            "collision":  any(agent.collided for agent in self.world.agents),
-            "traversal_limit_reached": self.visited_counter >= round(self.traversal_limit_factor * self.world.cells),
+            "collision": bool(world.collided.any()),
+            "traversal_limit_reached": self.traversal_limit_reached(),
             "agents": []
         }
 
-        for agent_id in individual_coverage:
+        for name, coverage, steps_taken in zip(self.agent_names, individual_coverage.astype(np.int64).tolist(),
+                                               world.steps_taken.tolist()):
             agent_info = {
-                "name": f"Agent {agent_id}",
-                "coverage": individual_coverage[agent_id],
-                "steps_taken": steps_taken[agent_id]
+                "name": name,
+                "coverage": coverage,
+                "steps_taken": steps_taken
             }
             info["agents"].append(agent_info)
 
         return info
         
     def reset(self):
-        self.window = None
-        self.world = self._initialise_world()
+        perf = self.profiler if self.profiling else None
+        if perf: reset_start = start = perf_counter()
+
+        self.world.reset(self.template)
+        if self.window:
+            self.window.set_world(self.world)
+        if self.rasterizer:
+            self.rasterizer.set_world(self.world)
         self.visited_counter = 0
-        initial_states = []
-        for agent in self.world.agents:
-            obs = self._get_obs(agent)
-            initial_states.append(obs)
-        
-        initial_state = np.stack(initial_states, axis=0)
+        self.new_episode = True
+        if perf: start = perf.lap('reset.world', start)
+
+        initial_state = self._get_obs(out=self.obs_buffer)
+        if perf: start = perf.lap('reset.obs', start)
+        if self.recorder:
+            self.recorder.capture(self)
+            if perf: start = perf.lap('reset.recording', start)
+        if perf: perf.add('reset', start - reset_start)
         return initial_state
 
+    def get_state(self):
+        """Return a compact, picklable and hashable snapshot of the dynamic state of the environment."""
+        return EnvState.capture(self.world, self.visited_counter, self.goal_reward_assigned)
+
+    def set_state(self, state):
+        """Restore the environment to a state returned by get_state(). Trails are cleared."""
+        self.visited_counter, self.goal_reward_assigned = state.restore(self.world)
+
+    def clone(self):
+        """Return an independent copy of the environment in the same state, without a renderer."""
+        env = copy.copy(self)
+        env.window = None
+        env.rasterizer = None
+        env.recorder = None
+        env.metrics = None
+        env.profiler = PerfStats()
+        env.obs_buffer = None
+        builder = self.obs_builder
+        env.obs_builder = ObservationBuilder(builder.view_radius, builder.dtype, builder.layout, builder.packed)
+        env.action_space = copy.deepcopy(self.action_space)
+        env.reward_engine = copy.copy(self.reward_engine)
+        env.move_events = MoveEvents(self.n_agents, self.view_radius, self.exploration_radius)
+        env.world = World.from_template(self.template)
+        env.set_state(self.get_state())
+        return env
+
     def render(self, mode='human', episode=None):
+        perf = self.profiler if self.profiling else None
+        if perf: start = perf_counter()
+
+        frame = None
         if mode == "human":
             self.render_gui()
         if mode == "image":
             self.render_image(episode)
+        if mode == "rgb_array":
+            frame = self.render_rgb_array()
+
+        if perf:
+            perf.lap(f'render.{mode}', start)
+            if mode != "rgb_array" and self.window is not None:
+                perf.add('render.frame', self.window.frame_time) # drawing only, without waiting for the frame rate
+        return frame
 
     def render_gui(self):
         """Render the environment in a GUI window."""
@@ -280,7 +537,74 @@ class MultiGridEnv(gym.Env):
             self.window = WorldRenderer("Grid world", self.world, fps=self.fps)
         self.window.render_image(episode)
 
+    def render_rgb_array(self):
+        """Rasterize the environment with NumPy and return it as a uint8 array of shape (height, width, 3)."""
+        if self.rasterizer is None or self.rasterizer.pixels_per_cell != self.pixels_per_cell:
+            self.rasterizer = GridRasterizer(self.world, self.pixels_per_cell, self.render_trails)
+        self.rasterizer.draw_trails = self.render_trails
+        return self.rasterizer.render()
+
+    def perf_stats(self):
+        """
+        Return the PerfStats holding the cumulative time and call count of each profiled phase:
+        'step' and its phases 'step.move', 'step.trails', 'step.reward', 'step.obs', 'step.info'
+        'step.recording' and 'step.metrics'; 'reset' and its phases 'reset.world', 'reset.obs' and
+        'reset.recording'; and 'render.<mode>' with 'render.frame' for the time the renderer spent
+        drawing. Counters are only updated while `profiling` is True.
+        """
+        return self.profiler
+
+    def start_recording(self, path, frame_skip=1, downscale=1, max_queued_frames=32):
+        """
+        Start streaming an rgb_array frame after every reset and step into an animated GIF, or a
+        video if the path has another extension. Frames are encoded in a background thread.
+
+        Parameters:
+            path (str): the output file, e.g. 'videos/episode.gif' or 'videos/episode.mp4'.
+            frame_skip (int): record every frame_skip-th frame.
+            downscale (int): the integer factor to shrink frames by.
+            max_queued_frames (int): the number of frames that may wait for encoding.
+        """
+        self.stop_recording()
+        self.recorder = EpisodeRecorder(path, fps=self.fps or FPS, frame_skip=frame_skip,
+                                        downscale=downscale, max_queued_frames=max_queued_frames)
+        return self.recorder
+
+    def stop_recording(self):
+        """Finish the file being recorded, waiting for the queued frames to be encoded."""
+        if self.recorder:
+            recorder, self.recorder = self.recorder, None
+            recorder.close()
+
+    def start_metrics(self, path, log_steps=False, **options):
+        """
+        Start logging a record of every episode, and of every step if log_steps is True, to a JSON
+        lines or CSV file. Records are written in a background thread by a MetricsSink; the fields
+        are listed in METRICS_FIELDS.
+
+        Parameters:
+            path (str): the output file, e.g. 'logs/metrics.jsonl' or 'logs/metrics.csv'.
+            log_steps (bool): whether to log a record of every step as well as of every episode.
+            options: further arguments of MetricsSink, e.g. flush_interval or drop_when_full.
+        """
+        self.stop_metrics()
+        options.setdefault('fields', METRICS_FIELDS)
+        self.metrics = MetricsSink(path, **options)
+        self.log_step_metrics = log_steps
+        # an episode in progress is logged as the first episode, with its totals counted from here
+        self.episode_index = -1
+        self.new_episode = True
+        return self.metrics
+
+    def stop_metrics(self):
+        """Finish the metrics file, waiting for the queued records to be written."""
+        if self.metrics:
+            metrics, self.metrics = self.metrics, None
+            metrics.close()
+
     def close(self):
+        self.stop_recording()
+        self.stop_metrics()
         if self.window:
             self.window.close()
         return
\ No newline at end of file
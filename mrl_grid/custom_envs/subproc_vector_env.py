@@ -0,0 +1,167 @@
+import multiprocessing as mp
+import traceback
+import cloudpickle
+import numpy as np
+from mrl_grid.custom_envs.grid_env import info_dtype
+
+class SharedArray:
+    """A NumPy array backed by shared memory that can be passed to worker processes."""
+    def __init__(self, shape, dtype):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        nbytes = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        self.raw = mp.RawArray('b', nbytes)
+
+    def array(self):
+        "return a NumPy view of the shared memory"
+        return np.frombuffer(self.raw, dtype=self.dtype, count=int(np.prod(self.shape))).reshape(self.shape)
+
+class SubprocVectorMultiGridEnv:
+    """
+    Runs one `MultiGridEnv` per worker process and steps them in parallel.
+
+    Workers write observations, rewards, done flags and the compact info record of their
+    environment (see `info_dtype`) straight into preallocated shared-memory arrays, observations
+    through the environment's `obs_buffer`, so the pipes only carry short command messages. Actions
+    are passed the same way. `step_async` starts the workers and returns immediately, so policy
+    inference can overlap with environment stepping until `step_wait` collects the results.
+    Environments that finish are reset automatically by their worker; their last observation
+    is returned in info["final_observation"].
+
+    Attributes:
+        num_envs (int): The number of environments, one per worker process.
+        n_agents (int): The number of agents in each environment.
+    """
+    def __init__(self, env_fns, start_method=None):
+        """
+        Parameters:
+            env_fns (list[callable]): functions that each create a MultiGridEnv. They are sent to the
+                                      workers with cloudpickle, so lambdas are allowed.
+            start_method (str): the multiprocessing start method, e.g. 'fork' or 'spawn'. If None,
+                                the platform default is used.
+        """
+        self.num_envs = len(env_fns)
+
+        # Build one environment locally to find the buffer shapes
+        probe = env_fns[0]()
+        obs = probe.reset()
+        self.n_agents = probe.n_agents
+        self.observation_space = probe.observation_space
+        self.action_space = probe.action_space
+        probe.close()
+
+        n = self.num_envs
+        self._shared = {
+            "obs": SharedArray((n,) + obs.shape, obs.dtype),
+            "final_obs": SharedArray((n,) + obs.shape, obs.dtype),
+            "actions": SharedArray((n, self.n_agents), np.int64),
+            "reward": SharedArray((n,), np.float64),
+            "done": SharedArray((n,), bool),
+            "info": SharedArray((n,), info_dtype(self.n_agents)),
+        }
+        self._buffers = {name: shared.array() for name, shared in self._shared.items()}
+
+        ctx = mp.get_context(start_method)
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n)])
+        self.processes = []
+        for index, (work_remote, remote, env_fn) in enumerate(zip(self.work_remotes, self.remotes, env_fns)):
+            args = (index, work_remote, remote, cloudpickle.dumps(env_fn), self._shared)
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        self.waiting = False
+        self.closed = False
+
+    def _send(self, command):
+        for remote in self.remotes:
+            remote.send(command)
+
+    def _wait(self):
+        for remote in self.remotes:
+            error = remote.recv()
+            if error is not None:
+                raise RuntimeError(f"Worker process failed:\n{error}")
+
+    def reset(self):
+        """Reset every environment and return the stacked initial observations."""
+        self._send("reset")
+        self._wait()
+        return self._buffers["obs"].copy()
+
+    def step_async(self, actions):
+        """Write the actions of every environment, shape (num_envs, n_agents), and start stepping."""
+        assert not self.waiting, "step_wait must be called before the next step_async"
+        self._buffers["actions"][...] = actions
+        self._send("step")
+        self.waiting = True
+
+    def step_wait(self):
+        """
+        Wait for the workers started by `step_async` and return the results.
+
+        Returns:
+            state (np.ndarray): observations of shape (num_envs,) + observation_space.shape.
+            reward (np.ndarray): the centralized reward of each environment, shape (num_envs,).
+            done (np.ndarray): boolean done flags, shape (num_envs,).
+            info (dict): arrays describing each environment before any automatic reset.
+        """
+        self._wait()
+        self.waiting = False
+
+        buffers = self._buffers
+        done = buffers["done"].copy()
+        info = {name: buffers["info"][name].copy() for name in buffers["info"].dtype.names}
+        if done.any():
+            info["final_observation"] = buffers["final_obs"][done]
+        return buffers["obs"].copy(), buffers["reward"].copy(), done, info
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            self._wait()
+        self._send("close")
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+def _worker(index, remote, parent_remote, env_fn, shared):
+    """Worker loop: step its environment on command and write the results to shared memory."""
+    parent_remote.close()
+    buffers = {name: array.array() for name, array in shared.items()}
+    env = cloudpickle.loads(env_fn)()
+    env.unwrapped.info_level = 'compact'
+    # the environment writes its observations straight into this worker's slot of shared memory
+    obs_buffer = buffers["obs"][index]
+    env.unwrapped.obs_buffer = obs_buffer
+
+    while True:
+        command = remote.recv()
+        try:
+            if command == "step":
+                state, reward, done, info = env.step(buffers["actions"][index])
+                buffers["reward"][index] = reward
+                buffers["done"][index] = done
+                buffers["info"][index] = info
+                if done:
+                    buffers["final_obs"][index] = state
+                    state = env.reset()
+                if state is not obs_buffer:
+                    obs_buffer[...] = state
+            elif command == "reset":
+                state = env.reset()
+                if state is not obs_buffer:
+                    obs_buffer[...] = state
+            elif command == "close":
+                env.close()
+                remote.close()
+                break
+            remote.send(None)
+        except Exception:
+            remote.send(traceback.format_exc())
@@ -0,0 +1,227 @@
+import gym.spaces
+import numpy as np
+from mrl_grid.world import MapTemplate, ACTION_DELTAS, VISITED_CHANNEL, AGENTS_CHANNEL
+from mrl_grid.reward_functions import REWARD_MAP
+from mrl_grid.observation import ObservationBuilder
+
+class VectorMultiGridEnv(gym.Env):
+    """
+    Steps `num_envs` copies of the same grid map in lockstep, holding the state of every copy in
+    stacked NumPy arrays instead of one `World` per environment.
+
+    Rewards, termination and observations follow `MultiGridEnv` exactly: agents move one after
+    the other in agent order, waiting or walking into an occupied cell is a collision, and the
+    traversal limit is checked after all agents have moved. Sub-environments that finish are
+    reset automatically; their last observation is returned in info["final_observation"].
+    """
+    def __init__(self, grid_map: list[list[int]], view_radius: int, traversal_limit_factor: float = None,
+                 num_envs: int = 8, obs_dtype: str = 'float32', obs_layout: str = 'channels_last',
+                 obs_packed: bool = False):
+        """
+        Parameters:
+            grid_map (list[list[int]]): the grid world shared by every sub-environment, in the same format as
+                                        for MultiGridEnv.
+            view_radius (int): the radius of the agent's observation area.
+            traversal_limit_factor (float): a factor that determines the maximum number of cells an agent can visit before
+                                            the episode terminates. If None, there is no traversal limit.
+            num_envs (int): the number of sub-environments stepped together.
+            obs_dtype (str): the dtype of observations, as for MultiGridEnv.
+            obs_layout (str): 'channels_last' or 'channels_first', as for MultiGridEnv.
+            obs_packed (bool): whether to pack the channels of each cell into the bits of one uint8, as for MultiGridEnv.
+        """
+
+        self.test_mode = False # Check if test mode is on
+
+        self.grid_map = np.asarray(grid_map)
+        self.cols, self.rows = self.grid_map.shape
+        self.grid_size = self.cols * self.rows
+        self.channels = 4
+        self.num_envs = num_envs
+
+        self.view_radius = view_radius
+        self.traversal_limit_factor = traversal_limit_factor
+
+        # Agents are numbered in the same order as in MultiGridEnv
+        self.template = MapTemplate(self.grid_map, padding=self.view_radius)
+        self.wall_mask = self.template.wall_mask
+        self.init_pos = self.template.agent_positions
+        self.n_agents = self.template.n_agents
+        self.cells = self.template.cells
+        self.traversal_limit = (round(self.traversal_limit_factor * self.cells)
+                                if self.traversal_limit_factor else None)
+
+        self.nA = 5 # no of actions (up, down, left, right, wait)
+        self.single_action_space = gym.spaces.MultiDiscrete([self.nA] * self.n_agents)
+        self.action_space = gym.spaces.MultiDiscrete(np.full((num_envs, self.n_agents), self.nA))
+
+        self.obs_builder = ObservationBuilder(self.view_radius, obs_dtype, obs_layout, obs_packed)
+        self.single_observation_space = self.obs_builder.space(self.n_agents)
+        self.observation_space = self.obs_builder.space(self.n_agents, num_envs)
+
+        self._template_tensor = self._build_template_tensor()
+        self._offsets = np.arange(2 * self.view_radius + 1)
+        self._env_index = np.arange(num_envs)
+
+        # Stacked dynamic state
+        self.tensor = np.empty((num_envs,) + self._template_tensor.shape, dtype=np.int8)
+        p = self.view_radius
+        self._global_state = self.tensor[:, p:p + self.cols, p:p + self.rows]
+        self._global_state.flags.writeable = False
+        self.agent_grid = np.empty((num_envs, self.cols, self.rows), dtype=np.int16)
+        self.pos = np.empty((num_envs, self.n_agents, 2), dtype=np.intp)
+        self.steps_taken = np.empty((num_envs, self.n_agents), dtype=np.int64)
+        self.cells_covered = np.empty((num_envs, self.n_agents), dtype=np.int64)
+        self.collided = np.empty((num_envs, self.n_agents), dtype=bool)
+        self.seen = np.empty(num_envs, dtype=np.int64)
+        self.visited_counter = np.empty(num_envs, dtype=np.int64)
+        # Like MultiGridEnv, the goal reward is only paid once per sub-environment
+        self.goal_reward_assigned = np.zeros(num_envs, dtype=bool)
+
+        self._reset_envs(np.ones(num_envs, dtype=bool))
+
+    def _build_template_tensor(self):
+        """Build the padded world tensor of a freshly reset sub-environment."""
+        p = self.view_radius
+        tensor = self.template.tensor.copy()
+        interior = tensor[p:p + self.cols, p:p + self.rows]
+        interior[self.init_pos[:, 0], self.init_pos[:, 1], VISITED_CHANNEL] = 1
+        interior[self.init_pos[:, 0], self.init_pos[:, 1], AGENTS_CHANNEL] = 1
+        return tensor
+
+    def _reset_envs(self, mask):
+        """Restore the sub-environments selected by the boolean mask to their initial state."""
+        self.tensor[mask] = self._template_tensor
+        self.agent_grid[mask] = -1
+        envs = np.flatnonzero(mask)[:, None]
+        self.agent_grid[envs, self.init_pos[:, 0], self.init_pos[:, 1]] = np.arange(self.n_agents)
+        self.pos[mask] = self.init_pos
+        self.steps_taken[mask] = 0
+        self.cells_covered[mask] = 1
+        self.collided[mask] = False
+        self.seen[mask] = self.n_agents
+        self.visited_counter[mask] = 0
+
+    def _get_obs(self):
+        """Get the observations of all agents in all sub-environments, with the shape of observation_space."""
+        _, height, width, _ = self.tensor.shape
+        b = self._env_index[:, None, None, None]
+        rows = self.pos[:, :, 0, None, None] + self._offsets[None, None, :, None]
+        cols = self.pos[:, :, 1, None, None] + self._offsets[None, None, None, :]
+        cells = (b * height + rows) * width + cols
+        return self.obs_builder.observe(self.tensor, cells)
+
+    def get_global_state(self):
+        """
+        Return the state of the whole map in every sub-environment as a read-only view of shape
+        (num_envs, cols, rows, 4), as for MultiGridEnv.get_global_state(). The view follows the
+        sub-environments as they step and reset.
+        """
+        return self._global_state
+
+    def _get_info(self):
+        """Return the information about every sub-environment as a dict of arrays."""
+        if self.traversal_limit is None:
+            traversal_limit_reached = np.zeros(self.num_envs, dtype=bool)
+        else:
+            traversal_limit_reached = self.visited_counter >= self.traversal_limit
+
+        return {
+            "total_coverage": np.round(self.seen / self.cells * 100).astype(np.int64),
+            "collision": self.collided.any(axis=1),
+            "traversal_limit_reached": traversal_limit_reached,
+            "coverage": np.round(self.cells_covered / self.cells * 100).astype(np.int64),
+            "steps_taken": self.steps_taken.copy(),
+        }
+
+    def step(self, actions):
+        """
+        Take a step in every sub-environment.
+
+        Parameters:
+            actions (np.ndarray): integer actions of shape (num_envs, n_agents).
+
+        Returns:
+            state (np.ndarray): observations with the shape of observation_space, by default (num_envs, n_agents, 2r+1, 2r+1, 4).
+            reward (np.ndarray): the centralized reward of each sub-environment, shape (num_envs,).
+            done (np.ndarray): boolean done flags, shape (num_envs,).
+            info (dict): arrays describing each sub-environment before any automatic reset.
+        """
+        actions = np.asarray(actions)
+        assert actions.shape == (self.num_envs, self.n_agents)
+
+        b = self._env_index
+        p = self.view_radius
+        reward_n = np.zeros((self.num_envs, self.n_agents))
+        done = np.zeros(self.num_envs, dtype=bool)
+
+        for i in range(self.n_agents):
+            self.steps_taken[:, i] += 1
+            old_x, old_y = self.pos[:, i, 0], self.pos[:, i, 1]
+            new_pos = self.pos[:, i] + ACTION_DELTAS[actions[:, i]]
+            new_x, new_y = new_pos[:, 0], new_pos[:, 1]
+
+            # Moves outside the grid boundary
+            illegal = ~((0 <= new_x) & (new_x < self.cols) & (0 <= new_y) & (new_y < self.rows))
+            reward_n[illegal, i] += REWARD_MAP['illegal']
+            new_x = np.where(illegal, old_x, new_x)
+            new_y = np.where(illegal, old_y, new_y)
+
+            # Collisions with walls or agents (including itself when waiting)
+            other = self.agent_grid[b, new_x, new_y]
+            collision = ~illegal & ((other >= 0) | self.wall_mask[new_x, new_y])
+            reward_n[collision, i] += REWARD_MAP['collision']
+            self.collided[collision, i] = True
+            hit = collision & (other >= 0)
+            self.collided[hit, other[hit]] = True
+            if not self.test_mode:
+                done |= collision
+
+            # Moves to new or previously seen cells
+            moved = ~illegal & ~collision
+            new_cell = moved & (self.tensor[b, new_x + p, new_y + p, VISITED_CHANNEL] != 1)
+            self.tensor[b[new_cell], new_x[new_cell] + p, new_y[new_cell] + p, VISITED_CHANNEL] = 1
+            self.cells_covered[new_cell, i] += 1
+            self.seen[new_cell] += 1
+            all_visited = new_cell & (self.seen == self.cells)
+            goal = all_visited & ~self.goal_reward_assigned
+            self.goal_reward_assigned |= goal
+            done |= all_visited
+            self.visited_counter[new_cell] = 0
+            self.visited_counter[moved] += 1
+
+            new_cell_reward = np.where(new_cell, REWARD_MAP['new'], 0) + np.where(goal, REWARD_MAP['goal'], 0)
+            reward_n[moved, i] += new_cell_reward[moved]
+            reward_n[moved, i] += REWARD_MAP['move']
+
+            # Commit the moves
+            mb, mx, my = b[moved], new_x[moved], new_y[moved]
+            ox, oy = old_x[moved], old_y[moved]
+            self.agent_grid[mb, ox, oy] = -1
+            self.agent_grid[mb, mx, my] = i
+            self.tensor[mb, ox + p, oy + p, AGENTS_CHANNEL] -= 1
+            self.tensor[mb, mx + p, my + p, AGENTS_CHANNEL] += 1
+            self.pos[moved, i, 0] = mx
+            self.pos[moved, i, 1] = my
+
+        # all agents get total reward in cooperative case
+        reward = reward_n.sum(axis=1)
+
+        # Check if traversal limit has been reached
+        if self.traversal_limit is not None:
+            done |= self.visited_counter >= self.traversal_limit
+
+        info = self._get_info()
+        state = self._get_obs()
+        if done.any():
+            info["final_observation"] = state[done]
+            self._reset_envs(done)
+            state[done] = self._get_obs()[done]
+
+        return state, reward, done, info
+
+    def reset(self):
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        return self._get_obs()
+
+    def close(self):
+        return
@@ -1,26 +1,40 @@
+def info_fields(info):
+    """Return the info of a step as a dict, converting a compact info record field by field."""
+    if isinstance(info, dict):
+        return info
+    return {name: info[name].tolist() for name in info.dtype.names}
+
 class Env:
     """
     Base class for all environment training models to be used only for MultiGridEnv class. 
     Used to define common methods and attributes.
     """
-    def __init__(self, env, episodes, n_split, render):
+    def __init__(self, env, episodes, n_split, render, metrics=None):
         self.env = env
         self.episodes = episodes
         self.n_split = n_split
         self.render = render
+        self.metrics = metrics # MetricsSink that a record of every episode is logged to, or None
+
+    def log_episode(self, n, reward, info):
+        """Queue a record of the episode in the metrics sink. Does nothing without a sink."""
+        if not self.metrics:
+            return
+        record = {'type': 'episode', 'episode': n, 'reward': reward}
+        record.update(info_fields(info))
+        self.metrics.log(record)
 
     def print_episode(self, n, reward, info):
         """Retrieves and prints info for current episode."""
+        lines = ["Episode: " + str(n).rjust(3)]
 
-        data_string = "Episode: " + str(n).rjust(3) + "\n"
-    
         # Print Info for current episode. Each key in info dict should be on new line
-        for key, value in info.items():
+        for key, value in info_fields(info).items():
             if key == 'agents':
-                for i, agent in enumerate(value):
-                    data_string += " | " + agent['name'] + f": Reward = {round(reward, 2)}" + f"| Coverage = {agent['coverage']}%" + f"| Steps Taken = {agent['steps_taken']}"+ "\n"
+                lines.extend(f" | {agent['name']}: Reward = {round(reward, 2)}| Coverage = {agent['coverage']}%"
+                             f"| Steps Taken = {agent['steps_taken']}" for agent in value)
                 continue
 
-            data_string += " | " + key + ": " + str(value).rjust(4) + "\n"
+            lines.append(" | " + key + ": " + str(value).rjust(4))
 
-        print(data_string)
\ No newline at end of file
+        print("\n".join(lines) + "\n")
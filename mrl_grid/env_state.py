@@ -0,0 +1,88 @@
+# Description: Compact snapshots of the dynamic state of a MultiGridEnv, used to branch and restore
+# environments in planning and tree-search rollouts.
+
+import numpy as np
+
+class EnvState:
+    """
+    Snapshot of the dynamic state of a MultiGridEnv packed into one contiguous int32 array.
+
+    The array holds, in order: the traversal counter, the goal-reward flag, the agent positions,
+    the per-agent steps taken, cells covered and collision flags, the visited-by grid and the
+    revisit counts grid. The static map lives in the environment's MapTemplate and trails are
+    only used for rendering, so neither is stored. States are picklable, compare by value and
+    hash by their bytes, so planners can use them to detect transpositions.
+
+    Attributes:
+        data (np.ndarray): The packed, read-only state.
+        n_agents (int): The number of agents in the environment.
+        shape (tuple): The shape of the grid map.
+    """
+    __slots__ = ('data', 'n_agents', 'shape', '_hash')
+
+    def __init__(self, data, n_agents, shape):
+        self.data = data
+        self.data.flags.writeable = False
+        self.n_agents = n_agents
+        self.shape = tuple(shape)
+        self._hash = None
+
+    @classmethod
+    def capture(cls, world, visited_counter, goal_reward_assigned):
+        """Pack the dynamic state of a world and the environment's counters."""
+        n = len(world.agents)
+        cells = world.visited_by.size
+        data = np.empty(2 + 5 * n + 2 * cells, dtype=np.int32)
+        data[0] = visited_counter
+        data[1] = goal_reward_assigned
+        parts = cls._split(data, n, cells)
+        parts['positions'][:] = world.positions.ravel()
+        parts['steps_taken'][:] = world.steps_taken
+        parts['cells_covered'][:] = world.cells_covered
+        parts['collided'][:] = world.collided
+        parts['visited_by'][:] = world.visited_by.ravel()
+        parts['revisits'][:] = world.revisits.ravel()
+        return cls(data, n, world.visited_by.shape)
+
+    @staticmethod
+    def _split(data, n, cells):
+        "views of the packed array, by field"
+        sizes = [('positions', 2 * n), ('steps_taken', n), ('cells_covered', n), ('collided', n),
+                 ('visited_by', cells), ('revisits', cells)]
+        parts, start = {}, 2
+        for name, size in sizes:
+            parts[name] = data[start:start + size]
+            start += size
+        return parts
+
+    def restore(self, world):
+        """Restore the world to this state and return the (visited_counter, goal_reward_assigned) counters."""
+        assert len(world.agents) == self.n_agents and world.visited_by.shape == self.shape, \
+            "state does not belong to this environment"
+        parts = self._split(self.data, self.n_agents, int(np.prod(self.shape)))
+        world.restore(
+            positions=parts['positions'].reshape(-1, 2),
+            visited_by=parts['visited_by'].reshape(self.shape),
+            revisits=parts['revisits'].reshape(self.shape),
+            steps_taken=parts['steps_taken'],
+            cells_covered=parts['cells_covered'],
+            collided=parts['collided'].astype(bool),
+        )
+        return int(self.data[0]), bool(self.data[1])
+
+    def __eq__(self, other):
+        if not isinstance(other, EnvState):
+            return NotImplemented
+        return self.shape == other.shape and np.array_equal(self.data, other.data)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self.data.tobytes())
+        return self._hash
+
+    def __getstate__(self):
+        return self.data, self.n_agents, self.shape
+
+    def __setstate__(self, state):
+        data, n_agents, shape = state
+        self.__init__(np.array(data), n_agents, shape)
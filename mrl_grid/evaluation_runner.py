@@ -0,0 +1,233 @@
+# Description: Evaluates a policy over many episodes in a pool of worker processes and aggregates the
+# outcome of every episode: coverage, steps, rewards, collisions and traversal limit hits.
+
+import multiprocessing as mp
+import os
+import time
+import cloudpickle
+import numpy as np
+from mrl_grid.env import Env
+
+PERCENTILES = (5, 25, 50, 75, 95)
+METRICS = ('coverage', 'steps', 'reward', 'collisions') # per-episode values reported with percentiles
+
+def random_policy(states, env, rng):
+    """Choose a uniformly random action for every agent."""
+    return rng.integers(0, env.nA, size=env.n_agents)
+
+class ParallelEvaluationRunner(Env):
+    """
+    This class is a subclass of the base environment (Env) and is used for evaluating a policy over
+    many episodes. Episodes are spread across a pool of worker processes, each with its own copy
+    of the environment, and the outcome of every episode is gathered into NumPy arrays.
+
+    Every episode gets its own random generator, spawned from one SeedSequence, so a run is
+    reproducible from its seed whatever the number of workers or the way episodes are split
+    between them.
+
+    Attributes:
+        env (gym.Env): The environment to evaluate in, or a function that creates it.
+        episodes (int): The number of episodes to run.
+        n_split (int): The interval at which to print episode information; the last episode is always printed. 0 prints nothing.
+        policy (callable): policy(states, env, rng) returning the actions of all agents.
+        n_workers (int): The number of worker processes. With 1, episodes run in this process.
+        seed (int): The seed the episode generators are spawned from.
+        max_steps (int): The step limit after which an episode is cut off, or None.
+        metrics (MetricsSink): The sink that a record of every episode is logged to, or None.
+
+    Methods:
+        run(): Runs the episodes and returns their EvaluationResults.
+    """
+    def __init__(self, env, episodes, n_split=0, policy=None, n_workers=None, seed=None, max_steps=None,
+                 chunk_size=None, metrics=None):
+        """
+        Parameters:
+            env (MultiGridEnv or callable): the environment, whose configuration is copied to every worker,
+                                             or a function that creates one. Functions are sent to the workers
+                                             with cloudpickle, so lambdas are allowed.
+            episodes (int): the number of episodes to run.
+            n_split (int): print the information of every n_split-th episode and of the last one. 0 prints nothing.
+            policy (callable): policy(states, env, rng) returning an action per agent, where rng is the
+                               episode's np.random.Generator. Defaults to random actions.
+            n_workers (int): the number of worker processes. Defaults to the number of CPUs.
+            seed (int): the seed of the run. If None, a random seed is drawn and kept in `seed`.
+            max_steps (int): cut episodes off after this many steps. If None, episodes run until done.
+            chunk_size (int): the number of episodes a worker runs per task. Defaults to a quarter of an
+                              even share per worker.
+            metrics (MetricsSink): a sink to log a record of every episode to, as its results arrive.
+        """
+        super().__init__(env, episodes, n_split, render=False, metrics=metrics)
+        self.policy = policy or random_policy
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.max_steps = max_steps
+        self.chunk_size = chunk_size or max(1, -(-episodes // (4 * self.n_workers)))
+
+    def _env_fn(self):
+        "return a function that creates the environment in a worker"
+        if callable(self.env):
+            return self.env
+        template = self.env.unwrapped.clone() # without renderer or recorder, so it can be pickled
+        return lambda: template
+
+    def run(self):
+        """Run the episodes and return their EvaluationResults."""
+        seeds = np.random.SeedSequence(self.seed).spawn(self.episodes)
+        chunks = [(first, seeds[first:first + self.chunk_size])
+                  for first in range(0, self.episodes, self.chunk_size)]
+        payload = (cloudpickle.dumps(self._env_fn()), cloudpickle.dumps(self.policy), self.max_steps, self.n_split,
+                   self.episodes)
+
+        start = time.perf_counter()
+        if self.n_workers == 1:
+            _init_worker(*payload)
+            results = self._collect(map(_run_episodes, chunks))
+        else:
+            with mp.Pool(self.n_workers, initializer=_init_worker, initargs=payload) as pool:
+                results = self._collect(pool.imap(_run_episodes, chunks))
+        wall_time = time.perf_counter() - start
+
+        arrays = {name: np.concatenate([result[name] for result in results]) for name in results[0]
+                  if name != 'printed'}
+        return EvaluationResults(arrays, wall_time, self.n_workers, self.seed)
+
+    def _collect(self, results):
+        "gather the results of every chunk in episode order, logging and printing episodes as they arrive"
+        collected = []
+        for first, result in zip(range(0, self.episodes, self.chunk_size), results):
+            if self.metrics:
+                self._log_chunk(first, result)
+            for n, reward, info in result['printed']:
+                self.print_episode(n, reward, info)
+            collected.append(result)
+        return collected
+
+    def _log_chunk(self, first, result):
+        "queue a record of every episode of a chunk in the metrics sink"
+        names = [name for name in result if name != 'printed']
+        for n, values in enumerate(zip(*(result[name].tolist() for name in names)), first):
+            record = {'type': 'episode', 'episode': n}
+            record.update(zip(names, values))
+            self.metrics.log(record)
+
+class EvaluationResults:
+    """
+    Outcome of every episode of an evaluation run, as arrays indexed by episode.
+
+    Attributes:
+        coverage (np.ndarray): The percentage of cells covered by the end of each episode.
+        steps (np.ndarray): The number of steps of each episode.
+        reward (np.ndarray): The total centralized reward of each episode.
+        collisions (np.ndarray): The number of colliding moves in each episode.
+        traversal_limit (np.ndarray): True for episodes ended by the traversal limit.
+        completed (np.ndarray): True for episodes in which every cell was covered.
+        truncated (np.ndarray): True for episodes cut off at max_steps.
+        wall_time (float): The duration of the run in seconds.
+        n_workers (int): The number of worker processes used.
+        seed (int): The seed of the run.
+    """
+    def __init__(self, arrays, wall_time, n_workers, seed):
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self.wall_time = wall_time
+        self.n_workers = n_workers
+        self.seed = seed
+
+    @property
+    def episodes(self):
+        return len(self.steps)
+
+    def summary(self):
+        """
+        Return the aggregates of the run as a dict: the mean, standard deviation and percentiles of
+        every per-episode metric, the rate of each episode outcome, and the throughput.
+        """
+        summary = {}
+        for name in METRICS:
+            values = getattr(self, name)
+            summary[name] = {'mean': float(values.mean()), 'std': float(values.std())}
+            summary[name].update({f"p{q}": float(value) for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))})
+        for name in ('traversal_limit', 'completed', 'truncated'):
+            summary[f"{name}_rate"] = float(getattr(self, name).mean())
+        summary['collision_rate'] = float(np.mean(self.collisions > 0))
+        summary['episodes'] = self.episodes
+        summary['episodes_per_s'] = self.episodes / self.wall_time
+        summary['steps_per_s'] = float(self.steps.sum()) / self.wall_time
+        summary['wall_time_s'] = self.wall_time
+        summary['n_workers'] = self.n_workers
+        summary['seed'] = self.seed
+        return summary
+
+    def report(self):
+        """Return the aggregates as a table."""
+        summary = self.summary()
+        lines = [f"{'metric':<12} {'mean':>10} {'std':>10}" + "".join(f"{f'p{q}':>10}" for q in PERCENTILES)]
+        for name in METRICS:
+            stats = summary[name]
+            lines.append(f"{name:<12} {stats['mean']:>10.2f} {stats['std']:>10.2f}"
+                         + "".join(f"{stats[f'p{q}']:>10.2f}" for q in PERCENTILES))
+        lines.append(f"completed {summary['completed_rate']:.1%} | traversal limit {summary['traversal_limit_rate']:.1%}"
+                     f" | any collision {summary['collision_rate']:.1%} | truncated {summary['truncated_rate']:.1%}")
+        lines.append(f"{summary['episodes']} episodes in {summary['wall_time_s']:.2f} s with {self.n_workers} workers:"
+                     f" {summary['episodes_per_s']:,.1f} episodes/s, {summary['steps_per_s']:,.0f} steps/s")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.report()
+
+# Worker process
+# --------------------------------------------------------------------------------------------
+
+_worker = {} # environment and settings of this worker process
+
+def _init_worker(env_fn, policy, max_steps, n_split, episodes):
+    "create this worker's environment once, before it runs any episodes"
+    env = cloudpickle.loads(env_fn)()
+    env.unwrapped.info_level = 'none' # episode outcomes are read from the environment itself
+    _worker.update(env=env, policy=cloudpickle.loads(policy), max_steps=max_steps, n_split=n_split, episodes=episodes)
+
+def _run_episodes(chunk):
+    "run a chunk of episodes, each with its own seeded generator, and return their outcomes as arrays"
+    first, seeds = chunk
+    env, policy, max_steps, n_split = _worker['env'], _worker['policy'], _worker['max_steps'], _worker['n_split']
+    episodes = _worker['episodes']
+    base = env.unwrapped
+    n = len(seeds)
+    result = {
+        'coverage': np.zeros(n),
+        'steps': np.zeros(n, dtype=np.int64),
+        'reward': np.zeros(n),
+        'collisions': np.zeros(n, dtype=np.int64),
+        'traversal_limit': np.zeros(n, dtype=bool),
+        'completed': np.zeros(n, dtype=bool),
+        'truncated': np.zeros(n, dtype=bool),
+        'printed': [],
+    }
+
+    for k, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        base.goal_reward_assigned = False # the environment only pays the goal reward once in its lifetime
+        states = env.reset()
+        episode_reward = 0.0
+        collisions = steps = 0
+        done = False
+        while not done and (max_steps is None or steps < max_steps):
+            states, reward, done, _ = env.step(policy(states, base, rng))
+            episode_reward += reward
+            collisions += int(np.count_nonzero(base.move_events.collision))
+            steps += 1
+
+        world = base.world
+        result['coverage'][k] = world.seen_count / world.cells * 100
+        result['steps'][k] = steps
+        result['reward'][k] = episode_reward
+        result['collisions'][k] = collisions
+        result['traversal_limit'][k] = base.traversal_limit_reached()
+        result['completed'][k] = world.all_cells_visited()
+        result['truncated'][k] = not done
+
+        if n_split and ((first + k) % n_split == 0 or first + k == episodes - 1):
+            base.info_level = 'full'
+            result['printed'].append((first + k, episode_reward, base._get_info()))
+            base.info_level = 'none'
+    return result
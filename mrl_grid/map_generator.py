@@ -0,0 +1,243 @@
+# Description: Seeded procedural generation of grid maps in the format of maps.py (0 for empty cells,
+# 1 for agent cells and 2 for walls): rooms and corridors, mazes and random obstacle fields. All
+# generators are NumPy based, the free cells of every map are connected, and maps are cached on disk
+# by seed and parameters.
+
+import hashlib
+import json
+import os
+import numpy as np
+
+EMPTY, AGENT, WALL = 0, 1, 2
+GENERATOR_VERSION = 1 # bump when the output of a generator changes, so cached maps are not reused
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'mrl_grid', 'maps')
+AGENT_PLACEMENTS = ('corners', 'random', 'cluster')
+
+GENERATORS = {} # map generators by kind
+
+def register_generator(kind):
+    """Decorator that registers a generator(shape, rng, **params) returning a grid of EMPTY and WALL cells."""
+    def decorator(generator):
+        GENERATORS[kind] = generator
+        return generator
+    return decorator
+
+def generate_map(kind, shape, seed=None, n_agents=1, agent_placement='corners',
+                 cache_dir=DEFAULT_CACHE_DIR, **params):
+    """
+    Generate a map with connected free cells and the agents placed on it.
+
+    Parameters:
+        kind (str): the generator to use: 'rooms', 'maze' or 'obstacles'.
+        shape (tuple[int, int]): the shape of the map array.
+        seed (int): the random seed. The same seed and parameters always give the same map.
+        n_agents (int): the number of agent cells to place.
+        agent_placement (str): 'corners' places agents on the free cells closest to the corners of
+                               the map, 'random' on random free cells and 'cluster' on the free
+                               cells closest to a random free cell.
+        cache_dir (str): the directory maps are cached in. Maps are only cached when a seed is
+                         given. If None, maps are not cached.
+        **params: parameters of the generator, see rooms(), maze() and obstacles().
+
+    Returns:
+        np.ndarray: the map as an int8 array of 0, 1 and 2. Use .tolist() for a list of lists.
+
+    Raises:
+        ValueError: if an argument is invalid, or the map is too small for its walls and agents.
+    """
+    if kind not in GENERATORS:
+        raise ValueError(f"kind must be one of {sorted(GENERATORS)}, not {kind!r}")
+    if agent_placement not in AGENT_PLACEMENTS:
+        raise ValueError(f"agent_placement must be one of {AGENT_PLACEMENTS}, not {agent_placement!r}")
+    shape = tuple(int(size) for size in shape)
+    if len(shape) != 2 or min(shape) < 1:
+        raise ValueError(f"shape must be two positive sizes, not {shape}")
+    if n_agents < 0 or n_agents > shape[0] * shape[1]:
+        raise ValueError(f"a {shape[0]}x{shape[1]} map cannot hold {n_agents} agents")
+
+    path = None
+    if cache_dir is not None and seed is not None:
+        key = json.dumps([GENERATOR_VERSION, kind, shape, seed, n_agents, agent_placement, sorted(params.items())])
+        name = f"{kind}_{shape[0]}x{shape[1]}_{hashlib.sha1(key.encode()).hexdigest()[:16]}.npy"
+        path = os.path.join(cache_dir, name)
+        if os.path.exists(path):
+            return np.load(path)
+
+    rng = np.random.default_rng(seed)
+    grid = GENERATORS[kind](shape, rng, **params)
+    grid = keep_largest_region(grid)
+    place_agents(grid, n_agents, agent_placement, rng)
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(temp_path, grid)
+        os.replace(temp_path, path) # maps appear atomically for concurrent readers
+    return grid
+
+# Generators
+# --------------------------------------------------------------------------------------------
+
+@register_generator('rooms')
+def rooms(shape, rng, n_rooms=None, room_size=(3, 8)):
+    """
+    Rectangular rooms joined by L-shaped corridors, inside a solid border.
+
+    Parameters:
+        n_rooms (int): the number of rooms. By default the rooms cover about half the map.
+        room_size (tuple[int, int]): the smallest and largest side of a room. Rooms are clamped to
+                                     the inside of the border, so small maps still get rooms.
+    """
+    height, width = shape
+    if height < 3 or width < 3:
+        raise ValueError(f"rooms maps need at least 3x3 cells to fit free cells inside the border, not {height}x{width}")
+    low, high = room_size
+    if not 1 <= low <= high:
+        raise ValueError(f"room_size must be (smallest side, largest side) with 1 <= smallest <= largest, not {room_size}")
+    high = max(low, min(high, height - 2, width - 2))
+    if n_rooms is None:
+        n_rooms = max(1, (height - 2) * (width - 2) // (2 * ((low + high) / 2) ** 2))
+    n_rooms = int(n_rooms)
+
+    sizes = rng.integers(low, high + 1, size=(n_rooms, 2))
+    sizes = np.minimum(sizes, [height - 2, width - 2])
+    corners = rng.integers(1, [height - 1, width - 1] - sizes + 1, size=(n_rooms, 2))
+    centers = corners + sizes // 2
+
+    grid = np.full(shape, WALL, dtype=np.int8)
+    for (r, c), (h, w) in zip(corners.tolist(), sizes.tolist()):
+        grid[r:r + h, c:c + w] = EMPTY
+
+    # Join consecutive rooms along a snake through bands of rows, so joined rooms are close together
+    band = centers[:, 0] // (2 * high)
+    along = np.where(band % 2 == 0, centers[:, 1], -centers[:, 1])
+    centers = centers[np.lexsort((along, band))]
+    for (r0, c0), (r1, c1) in zip(centers[:-1].tolist(), centers[1:].tolist()):
+        grid[min(r0, r1):max(r0, r1) + 1, c0] = EMPTY
+        grid[r1, min(c0, c1):max(c0, c1) + 1] = EMPTY
+    return grid
+
+@register_generator('maze')
+def maze(shape, rng, loops=0.0):
+    """
+    A maze of one-cell-wide corridors inside a solid border, carved with the binary tree
+    algorithm: every maze cell opens a passage either up or to the left. Without loops there is
+    exactly one path between any two cells.
+
+    Parameters:
+        loops (float): the fraction of the remaining inner walls between maze cells to knock down,
+                       which adds loops.
+    """
+    height, width = shape
+    grid = np.full(shape, WALL, dtype=np.int8)
+    n_rows, n_cols = (height - 1) // 2, (width - 1) // 2
+    if n_rows < 1 or n_cols < 1:
+        return np.zeros(shape, dtype=np.int8)
+
+    i, j = np.indices((n_rows, n_cols))
+    grid[1:2 * n_rows:2, 1:2 * n_cols:2] = EMPTY
+
+    # Open up, except in the first row, or left, except in the first column
+    up = (rng.random((n_rows, n_cols)) < 0.5) & (i > 0) | (j == 0) & (i > 0)
+    left = ~up & (j > 0)
+    grid[2 * i[up], 2 * j[up] + 1] = EMPTY
+    grid[2 * i[left] + 1, 2 * j[left]] = EMPTY
+
+    if loops > 0:
+        # inner walls between two maze cells sit at one odd and one even index
+        walls = np.zeros(shape, dtype=bool)
+        walls[1:2 * n_rows:2, 2:2 * n_cols - 1:2] = True
+        walls[2:2 * n_rows - 1:2, 1:2 * n_cols:2] = True
+        walls &= grid == WALL
+        knock_down = walls & (rng.random(shape) < loops)
+        grid[knock_down] = EMPTY
+    return grid
+
+@register_generator('obstacles')
+def obstacles(shape, rng, density=0.3):
+    """
+    Walls scattered at random over an open field. Pockets of free cells cut off by walls are
+    filled in, so only the largest open region is kept.
+
+    Parameters:
+        density (float): the probability that a cell is a wall.
+    """
+    return np.where(rng.random(shape) < density, WALL, EMPTY).astype(np.int8)
+
+# Helper functions
+# --------------------------------------------------------------------------------------------
+
+def label_regions(free):
+    """
+    Label the 4-connected regions of the True cells of a boolean grid. Returns an int array
+    holding, for every free cell, the smallest flat index in its region, and -1 elsewhere.
+
+    Regions are found with a vectorized union-find: each round hooks the root of every edge onto
+    the smaller root across it, then pointer jumping flattens every tree, so the number of rounds
+    grows with the logarithm of the region size rather than its diameter.
+    """
+    index = np.arange(free.size).reshape(free.shape)
+    pairs = [
+        (index[:-1, :][free[:-1, :] & free[1:, :]], index[1:, :][free[:-1, :] & free[1:, :]]),
+        (index[:, :-1][free[:, :-1] & free[:, 1:]], index[:, 1:][free[:, :-1] & free[:, 1:]]),
+    ]
+    u = np.concatenate([a for a, _ in pairs])
+    v = np.concatenate([b for _, b in pairs])
+
+    parent = np.arange(free.size)
+    while True:
+        pu, pv = parent[u], parent[v]
+        differ = pu != pv
+        if not differ.any():
+            break
+        u, v, pu, pv = u[differ], v[differ], pu[differ], pv[differ]
+        # every parent is a root after pointer jumping, so this joins whole trees
+        np.minimum.at(parent, np.maximum(pu, pv), np.minimum(pu, pv))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    return np.where(free, parent.reshape(free.shape), -1)
+
+def keep_largest_region(grid):
+    """Turn every free cell outside the largest 4-connected region of free cells into a wall."""
+    free = grid != WALL
+    if not free.any():
+        return grid
+    labels = label_regions(free)
+    largest = np.bincount(labels[free]).argmax()
+    grid = grid.copy()
+    grid[free & (labels != largest)] = WALL
+    return grid
+
+def place_agents(grid, n_agents, placement, rng):
+    """Mark n_agents free cells of the grid as agent cells, in place."""
+    free = np.argwhere(grid == EMPTY)
+    if len(free) < n_agents:
+        raise ValueError(f"the map has {len(free)} connected free cells, not enough for {n_agents} agents")
+    height, width = grid.shape
+
+    if placement == 'random':
+        chosen = rng.choice(len(free), size=n_agents, replace=False)
+    elif placement == 'cluster':
+        center = free[rng.integers(len(free))]
+        chosen = np.argsort(np.abs(free - center).sum(axis=1), kind='stable')[:n_agents]
+    else:
+        corners = np.array([[0, 0], [height - 1, width - 1], [0, width - 1], [height - 1, 0]])
+        chosen = []
+        taken = np.zeros(len(free), dtype=bool)
+        for k in range(n_agents):
+            if k < len(corners):
+                distance = np.abs(free - corners[k]).sum(axis=1)
+                distance[taken] = np.iinfo(distance.dtype).max
+                choice = int(distance.argmin())
+            else:
+                choice = int(rng.choice(np.flatnonzero(~taken)))
+            taken[choice] = True
+            chosen.append(choice)
+
+    rows, cols = free[np.asarray(chosen, dtype=np.intp)].T
+    grid[rows, cols] = AGENT
+    return grid
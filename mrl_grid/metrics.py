@@ -0,0 +1,184 @@
+# Description: Writes per-step and per-episode metrics records as JSON lines or CSV from a background
+# thread, so logging costs the training loop little more than putting a dict on a queue.
+
+import collections
+import csv
+import io
+import json
+import os
+import threading
+import time
+import numpy as np
+
+METRICS_FORMATS = ('jsonl', 'csv')
+
+def to_json(value):
+    """Convert NumPy values in a record, including compact info records, to plain Python values."""
+    if isinstance(value, np.ndarray) and value.dtype.names and value.ndim == 0:
+        value = value[()]
+    if isinstance(value, np.void) and value.dtype.names:
+        return {name: value[name] for name in value.dtype.names}
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class MetricsSink:
+    """
+    Writes records, dicts of named values, to a JSON lines or CSV file. log() only appends the record
+    to a bounded queue; a background thread converts and writes the records in batches and flushes
+    the file at most every flush_interval seconds, so the caller never waits on the disk.
+
+    The queue is a deque rather than a queue.Queue: appending to it takes no lock, and the writer is
+    only woken once a batch is full, so logging a record costs well under a microsecond. Records
+    must not be changed after they are logged.
+
+    In CSV files the columns are the keys of the first record unless `fields` is given; missing
+    values are left empty, extra keys are dropped, and lists and dicts are written as JSON.
+
+    Attributes:
+        path (str): The file being written.
+        format (str): 'jsonl' or 'csv'.
+        records_written (int): The number of records written so far.
+        dropped (int): The number of records dropped because the queue was full, with drop_when_full.
+    """
+    def __init__(self, path, format=None, fields=None, append=False, max_queued_records=10_000,
+                 batch_size=512, flush_interval=1.0, drop_when_full=False):
+        """
+        Parameters:
+            path (str): the output file, e.g. 'logs/episodes.jsonl' or 'logs/episodes.csv'.
+            format (str): 'jsonl' or 'csv'. By default it follows the file extension: CSV for .csv,
+                          JSON lines otherwise.
+            fields (list[str]): the CSV columns. By default the keys of the first record.
+            append (bool): whether to append to an existing file instead of replacing it.
+            max_queued_records (int): the number of records that may wait to be written.
+            batch_size (int): the number of queued records that wakes the writer, and the largest
+                              number of records written at once.
+            flush_interval (float): the longest time in seconds between writes and flushes of the file.
+            drop_when_full (bool): whether log() drops records when the queue is full, counting them in
+                                   `dropped`, instead of waiting for the writer.
+        """
+        if format is None:
+            format = 'csv' if os.path.splitext(path)[1].lower() == '.csv' else 'jsonl'
+        assert format in METRICS_FORMATS, f"format must be one of {METRICS_FORMATS}"
+        self.path = path
+        self.format = format
+        self.fields = list(fields) if fields else None
+        self.max_queued_records = max_queued_records
+        self.batch_size = min(batch_size, max_queued_records)
+        self.flush_interval = flush_interval
+        self.drop_when_full = drop_when_full
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self._file = open(path, 'a' if append else 'w', newline='')
+        self._write_header = format == 'csv' and write_header
+
+        self.records_written = 0
+        self.dropped = 0
+        self.error = None
+        self.closed = False
+        self._records = collections.deque()
+        self._flush_requests = collections.deque() # events set once the records before them are flushed
+        self._wake = threading.Event() # wakes the writer before its flush interval is up
+        self._drained = threading.Event() # set by the writer whenever it has taken records off the queue
+        self._thread = threading.Thread(target=self._write_loop, name='MetricsSink', daemon=True)
+        self._thread.start()
+
+    def log(self, record):
+        """Queue a record, a dict of named values, to be written."""
+        records = self._records
+        if len(records) >= self.batch_size:
+            self._wake.set()
+            if len(records) >= self.max_queued_records:
+                if self.drop_when_full:
+                    self.dropped += 1
+                    return
+                while len(records) >= self.max_queued_records and self._thread.is_alive():
+                    self._drained.clear()
+                    self._wake.set()
+                    self._drained.wait(0.1)
+        records.append(record)
+
+    def flush(self):
+        """Wait until every record logged so far is written and flushed to the file."""
+        flushed = threading.Event()
+        self._flush_requests.append(flushed)
+        self._wake.set()
+        while not flushed.wait(0.1) and self._thread.is_alive():
+            pass
+
+    def close(self):
+        """Write the remaining records and close the file."""
+        if self.closed:
+            return
+        self.closed = True
+        self._wake.set()
+        self._thread.join()
+        self._file.close()
+        if self.error is not None:
+            raise RuntimeError(f"Writing metrics to {self.path} failed") from self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Background thread
+    # ----------------------------------------------------------------------------------------
+
+    def _write_loop(self):
+        records = self._records
+        last_flush = time.monotonic()
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            stop = self.closed
+            flush_requests = len(self._flush_requests) # requests made before the records are taken
+
+            while records:
+                batch = [records.popleft() for _ in range(min(self.batch_size, len(records)))]
+                self._drained.set()
+                if self.error is None: # after an error, keep draining so log() never blocks
+                    try:
+                        self._file.write(self._encode(batch))
+                        self.records_written += len(batch)
+                    except Exception as error:
+                        self.error = error
+
+            if flush_requests or stop or time.monotonic() - last_flush >= self.flush_interval:
+                try:
+                    self._file.flush()
+                except Exception as error:
+                    self.error = self.error or error
+                last_flush = time.monotonic()
+            for _ in range(flush_requests):
+                self._flush_requests.popleft().set()
+            if stop:
+                return
+
+    def _encode(self, records):
+        "encode a batch of records into one string"
+        if self.format == 'jsonl':
+            return ''.join(json.dumps(record, default=to_json) + '\n' for record in records)
+
+        if self.fields is None:
+            self.fields = list(records[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if self._write_header:
+            writer.writerow(self.fields)
+            self._write_header = False
+        for record in records:
+            writer.writerow([self._csv_value(record.get(field, '')) for field in self.fields])
+        return buffer.getvalue()
+
+    @staticmethod
+    def _csv_value(value):
+        if isinstance(value, (np.ndarray, np.generic)):
+            value = to_json(value)
+        if isinstance(value, (list, tuple, dict)):
+            return json.dumps(value, default=to_json)
+        return value
@@ -0,0 +1,167 @@
+# Description: Builds the partial observations of all agents at once from the padded world tensor, in
+# the configured dtype, channel layout or bit-packed form.
+
+import gym.spaces
+import numpy as np
+from mrl_grid.world import SELF_CHANNEL, AGENTS_CHANNEL, WALL_CHANNEL
+
+CHANNELS = 4
+OBS_DTYPES = ('float32', 'float64', 'int8', 'uint8')
+OBS_LAYOUTS = ('channels_last', 'channels_first')
+OUTSIDE_BIT = 4 # bit set in packed observations for cells outside the grid
+CHANNEL_BITS = (1 << np.arange(CHANNELS)).astype(np.uint8) # bit of each channel in packed observations
+
+class ObservationBuilder:
+    """
+    Cuts every agent's view window out of `World.tensor` with a single gather.
+
+    The world tensor is padded by at least `view_radius` cells of -1, so the window of an agent at
+    (x, y) is simply tensor[x:x + 2r + 1, y:y + 2r + 1] in padded coordinates. The windows of all
+    agents are taken together, and the agent itself is then moved from the agents channel into the
+    self channel at the window centre. Unpacked channels_last windows are gathered straight into
+    the observations; other forms go through a reused int8 scratch array and are written out in the
+    configured form:
+        - dtype float32, float64 or int8: channel values -1 (outside the grid), 0 and 1.
+        - dtype uint8: the int8 values in two's complement, so -1 is stored as 255. View the array
+          as int8 to get the signed values back.
+        - packed: one uint8 per cell instead of a channel axis. Bit c is set when channel c is 1,
+          and bit OUTSIDE_BIT for cells outside the grid. See unpack_observation().
+
+    Attributes:
+        view_radius (int): The radius of the agent's observation area.
+        view_size (int): The side length of the observation window (2 * view_radius + 1).
+        dtype (np.dtype): The dtype of the returned observations, uint8 when packed.
+        layout (str): 'channels_last' for (2r+1, 2r+1, 4) windows or 'channels_first' for (4, 2r+1, 2r+1).
+        packed (bool): Whether each cell is packed into the bits of a single byte.
+    """
+    def __init__(self, view_radius, dtype=np.float32, layout='channels_last', packed=False):
+        assert layout in OBS_LAYOUTS, f"layout must be one of {OBS_LAYOUTS}"
+        assert np.dtype(dtype).name in OBS_DTYPES, f"dtype must be one of {OBS_DTYPES}"
+        self.view_radius = view_radius
+        self.view_size = 2 * view_radius + 1
+        self.dtype = np.dtype(np.uint8 if packed else dtype)
+        self.layout = layout
+        self.packed = packed
+        self._offsets = np.arange(self.view_size)
+        self._window_cells = np.zeros((self.view_size, self.view_size), dtype=np.intp) # flat offsets of a window
+        self._window_width = None # tensor width the window offsets were computed for
+        self._window = np.empty((0, self.view_size, self.view_size, CHANNELS), dtype=np.int8)
+
+    @property
+    def window_shape(self):
+        "shape of the observation of one agent"
+        size = self.view_size
+        if self.packed:
+            return (size, size)
+        if self.layout == 'channels_first':
+            return (CHANNELS, size, size)
+        return (size, size, CHANNELS)
+
+    def shape(self, n_agents, num_envs=None):
+        """Return the shape of the observations of n_agents, optionally for a batch of num_envs environments."""
+        batch = (n_agents,) if num_envs is None else (num_envs, n_agents)
+        return batch + self.window_shape
+
+    def space(self, n_agents, num_envs=None):
+        """Return the gym Box that the observations returned by build() belong to."""
+        if self.packed:
+            low, high = 0, (1 << (OUTSIDE_BIT + 1)) - 1
+        elif self.dtype == np.uint8:
+            low, high = 0, 255
+        else:
+            low, high = -1, 1
+        return gym.spaces.Box(low=low, high=high, shape=self.shape(n_agents, num_envs), dtype=self.dtype)
+
+    def build(self, world, agent_indices=None, out=None):
+        """
+        Return the observations of the given agents (all agents if None) as an array of shape
+        shape(n_agents). If out is given, the observations are written into it and it is returned.
+        """
+        assert world.padding >= self.view_radius, "world tensor must be padded by at least view_radius"
+
+        width = world.tensor.shape[1]
+        if width != self._window_width:
+            self._window_cells = self._offsets[:, None] * width + self._offsets[None, :]
+            self._window_width = width
+        pos = world.positions if agent_indices is None else world.positions[agent_indices]
+        corner = (pos[:, 0] * width + pos[:, 1]) + (world.padding - self.view_radius) * (width + 1)
+        cells = corner[:, None, None] + self._window_cells
+        return self.observe(world.tensor, cells, out)
+
+    def observe(self, tensor, cells, out=None):
+        """
+        Return the observations of the windows whose cells have the given flat indices into the
+        (height, width) plane of a padded int8 tensor of shape (..., height, width, 4), written
+        into out if given.
+        """
+        if self.packed or self.layout != 'channels_last':
+            return self.convert(self.gather(tensor, cells), out)
+
+        # a single gather, straight into int8 or uint8 (two's complement) observations
+        flat = tensor.reshape(-1, CHANNELS)
+        if out is None:
+            out = flat.take(cells, axis=0)
+            if self.dtype != np.int8:
+                out = out.astype(self.dtype)
+        else:
+            shape = cells.shape + self.window_shape[-1:]
+            assert out.shape == shape and out.dtype == self.dtype, \
+                f"out must have shape {shape} and dtype {self.dtype}, not {out.shape} and {out.dtype}"
+            if self.dtype.itemsize == 1:
+                np.take(flat, cells, axis=0, out=out.view(np.int8), mode='clip')
+            else:
+                np.copyto(out, self.gather(tensor, cells), casting='unsafe')
+
+        r = self.view_radius
+        out[..., r, r, SELF_CHANNEL] = 1
+        out[..., r, r, AGENTS_CHANNEL] -= 1
+        return out
+
+    def gather(self, tensor, cells):
+        """
+        Gather the cells with the given flat indices into the (height, width) plane of a padded
+        int8 tensor of shape (..., height, width, 4). Returns an int8 array of shape
+        cells.shape + (4,) that is reused by the next gather.
+        """
+        shape = cells.shape + (CHANNELS,)
+        if self._window.shape != shape:
+            self._window = np.empty(shape, dtype=np.int8)
+        np.take(tensor.reshape(-1, CHANNELS), cells, axis=0, out=self._window, mode='clip')
+        return self._window
+
+    def convert(self, window, out=None):
+        """
+        Move each agent from the agents channel into the self channel at the centre of its int8
+        window, shape (..., 2r+1, 2r+1, 4), and write the windows into out in the configured
+        dtype, layout or packed form. A new array is returned if out is None.
+        """
+        r = self.view_radius
+        window[..., r, r, SELF_CHANNEL] = 1
+        window[..., r, r, AGENTS_CHANNEL] -= 1
+
+        shape = window.shape[:-3] + self.window_shape
+        if out is None:
+            out = np.empty(shape, dtype=self.dtype)
+        assert out.shape == shape and out.dtype == self.dtype, \
+            f"out must have shape {shape} and dtype {self.dtype}, not {out.shape} and {out.dtype}"
+
+        if self.packed:
+            np.matmul((window == 1).view(np.uint8), CHANNEL_BITS, out=out)
+            out |= (window[..., WALL_CHANNEL] < 0).view(np.uint8) << OUTSIDE_BIT
+        elif self.layout == 'channels_first':
+            np.copyto(out, np.moveaxis(window, -1, -3), casting='unsafe')
+        else:
+            np.copyto(out, window, casting='unsafe')
+        return out
+
+def unpack_observation(packed, dtype=np.float32, layout='channels_last'):
+    """
+    Expand packed observations, shape (..., 2r+1, 2r+1), into channels with values -1 (outside the
+    grid), 0 and 1, as returned without packing.
+    """
+    assert layout in OBS_LAYOUTS, f"layout must be one of {OBS_LAYOUTS}"
+    channels = ((packed[..., None] & CHANNEL_BITS) > 0).astype(dtype)
+    channels[(packed & (1 << OUTSIDE_BIT)) > 0] = -1
+    if layout == 'channels_first':
+        channels = np.moveaxis(channels, -1, -3)
+    return channels
@@ -0,0 +1,57 @@
+# Description: Lightweight timing counters used to profile the phases of MultiGridEnv.step(), reset()
+# and render() without an external profiler.
+
+from time import perf_counter
+
+class PerfStats:
+    """
+    Cumulative time and call count per named phase.
+
+    Phases are timed by the environment with lap(), which adds the time since the previous lap
+    and returns the current time to start the next one, so consecutive phases cost a single
+    clock read each.
+
+    Attributes:
+        totals (dict): Cumulative seconds by phase.
+        counts (dict): Number of calls by phase.
+    """
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    def add(self, phase, seconds):
+        """Add one call taking the given number of seconds to a phase."""
+        self.totals[phase] = self.totals.get(phase, 0.0) + seconds
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+
+    def lap(self, phase, start):
+        """Add the time since start to a phase and return the current time."""
+        now = perf_counter()
+        self.add(phase, now - start)
+        return now
+
+    def reset(self):
+        """Clear all counters."""
+        self.totals.clear()
+        self.counts.clear()
+
+    def snapshot(self):
+        """Return a copy of the counters as {phase: {'calls', 'total_s', 'mean_us'}}."""
+        return {
+            phase: {
+                'calls': self.counts[phase],
+                'total_s': total,
+                'mean_us': total / self.counts[phase] * 1e6,
+            }
+            for phase, total in self.totals.items()
+        }
+
+    def report(self):
+        """Return the counters as a table, slowest phase first."""
+        lines = [f"{'phase':<20} {'calls':>10} {'total s':>10} {'mean us':>10}"]
+        for phase, stats in sorted(self.snapshot().items(), key=lambda item: -item[1]['total_s']):
+            lines.append(f"{phase:<20} {stats['calls']:>10} {stats['total_s']:>10.3f} {stats['mean_us']:>10.1f}")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.report()
@@ -11,13 +11,14 @@ class RandomActionRunner(Env):
         episodes (int): The number of episodes to run the environment.
         n_split (int): The interval at which to print episode information.
         render (bool): Whether to render the environment or not.
+        metrics (MetricsSink): The sink that a record of every episode is logged to, or None.
 
     Methods:
         run(): Runs the environment for the specified number of episodes.
         select_actions(): Selects random actions for each agent in the environment.
     """
-    def __init__(self, env, episodes, n_split, render):
-        super().__init__(env, episodes, n_split, render)
+    def __init__(self, env, episodes, n_split, render, metrics=None):
+        super().__init__(env, episodes, n_split, render, metrics)
 
     def run(self):
         for n in range(self.episodes):
@@ -33,6 +34,7 @@ class RandomActionRunner(Env):
                 states = next_states
                 episode_reward += reward
 
+            self.log_episode(n, episode_reward, info)
             if n % self.n_split == 0 or n == self.episodes-1:
 
                 self.print_episode(n, episode_reward, info)
@@ -0,0 +1,169 @@
+# Description: Streams rendered frames of an environment into an animated GIF or a video file while
+# episodes run. Frames are encoded in a background thread and written as they arrive.
+
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import numpy as np
+from PIL import Image, GifImagePlugin
+
+class EpisodeRecorder:
+    """
+    Records frames into an animated GIF or, for any other file extension, a video encoded by an
+    ffmpeg process. Frames pass through a bounded queue to a background thread that downscales,
+    encodes and writes them, so memory stays bounded however long the recording is and the
+    caller only pays for copying each frame into the queue.
+
+    Attributes:
+        path (str): The file being written.
+        fps (float): The frame rate of the recorded episode before frame skipping.
+        frame_skip (int): Only every frame_skip-th frame offered to capture() is recorded.
+        downscale (int): Frames are shrunk by this integer factor, averaging each block of pixels.
+        frames_written (int): The number of frames encoded so far.
+    """
+    def __init__(self, path, fps=20, frame_skip=1, downscale=1, max_queued_frames=32):
+        """
+        Parameters:
+            path (str): the output file, e.g. 'videos/episode.gif' or 'videos/episode.mp4'.
+            fps (float): the frame rate of the environment's frames before frame skipping.
+            frame_skip (int): record every frame_skip-th frame.
+            downscale (int): the integer factor to shrink frames by.
+            max_queued_frames (int): the number of frames that may wait for encoding. When the
+                                     queue is full, adding a frame waits for the encoder.
+        """
+        assert frame_skip >= 1 and downscale >= 1, "frame_skip and downscale must be at least 1"
+        self.path = path
+        self.fps = fps
+        self.frame_skip = frame_skip
+        self.downscale = downscale
+        self.is_gif = os.path.splitext(path)[1].lower() == '.gif'
+        if not self.is_gif and shutil.which('ffmpeg') is None:
+            raise RuntimeError("ffmpeg must be installed to record video, or record to a .gif file instead")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.frames_offered = 0
+        self.frames_written = 0
+        self.error = None
+        self.closed = False
+        self._file = None
+        self._ffmpeg = None
+        self._previous = None # the last frame written to a GIF
+        self._queue = queue.Queue(maxsize=max_queued_frames)
+        self._thread = threading.Thread(target=self._encode_loop, name='EpisodeRecorder', daemon=True)
+        self._thread.start()
+
+    def capture(self, env):
+        """Render the environment as an rgb_array frame and record it, unless the frame is skipped."""
+        if self.frames_offered % self.frame_skip == 0:
+            self._queue.put(env.render('rgb_array'))
+        self.frames_offered += 1
+
+    def add_frame(self, frame):
+        """Record a uint8 RGB frame of shape (height, width, 3), unless the frame is skipped."""
+        if self.frames_offered % self.frame_skip == 0:
+            self._queue.put(np.array(frame, dtype=np.uint8))
+        self.frames_offered += 1
+
+    def close(self):
+        """Encode the remaining frames and finish the file."""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise RuntimeError(f"Recording to {self.path} failed") from self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # Background thread
+    # ----------------------------------------------------------------------------------------
+
+    def _encode_loop(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                continue # keep draining so the caller never blocks on a failed encoder
+            try:
+                self._write(self._downscale(frame))
+                self.frames_written += 1
+            except Exception as error:
+                self.error = error
+        try:
+            self._finish()
+        except Exception as error:
+            self.error = self.error or error
+
+    def _downscale(self, frame):
+        k = self.downscale
+        if k == 1:
+            return frame
+        height, width = frame.shape[0] // k, frame.shape[1] // k
+        blocks = frame[:height * k, :width * k].reshape(height, k, width, k, -1)
+        return blocks.mean(axis=(1, 3)).round().astype(np.uint8)
+
+    def _write(self, frame):
+        if self.is_gif:
+            self._write_gif_frame(frame)
+        else:
+            self._write_video_frame(frame)
+
+    def _write_gif_frame(self, frame):
+        if self._file is None:
+            self._file = open(self.path, 'wb')
+            header, _ = GifImagePlugin.getheader(Image.fromarray(frame).quantize(256), info={'loop': 0})
+            self._file.write(b''.join(header))
+            top, left, region = 0, 0, frame
+        else:
+            # only write the box around the pixels that changed, drawn over the previous frame
+            changed = np.any(frame != self._previous, axis=2)
+            rows, cols = np.any(changed, axis=1).nonzero()[0], np.any(changed, axis=0).nonzero()[0]
+            if len(rows):
+                top, left = rows[0], cols[0]
+                region = frame[top:rows[-1] + 1, left:cols[-1] + 1]
+            else:
+                top, left, region = 0, 0, frame[:1, :1]
+        self._previous = frame
+
+        # each frame gets its own palette, so colours that appear later in the episode are kept
+        image = Image.fromarray(np.ascontiguousarray(region)).quantize(256)
+        duration = 1000 * self.frame_skip / self.fps # milliseconds
+        chunks = GifImagePlugin.getdata(image, offset=(int(left), int(top)), duration=duration,
+                                        disposal=1, include_color_table=True)
+        for chunk in chunks:
+            self._file.write(chunk)
+
+    def _write_video_frame(self, frame):
+        # yuv420p video needs an even width and height
+        height, width = frame.shape[0] + frame.shape[0] % 2, frame.shape[1] + frame.shape[1] % 2
+        if self._ffmpeg is None:
+            self._ffmpeg = subprocess.Popen(
+                ['ffmpeg', '-y', '-loglevel', 'error',
+                 '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}',
+                 '-r', str(self.fps / self.frame_skip), '-i', '-',
+                 '-pix_fmt', 'yuv420p', self.path],
+                stdin=subprocess.PIPE,
+            )
+        if frame.shape[:2] != (height, width):
+            frame = np.pad(frame, ((0, height - frame.shape[0]), (0, width - frame.shape[1]), (0, 0)), mode='edge')
+        self._ffmpeg.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def _finish(self):
+        if self._file is not None:
+            self._file.write(b';') # GIF trailer
+            self._file.close()
+        if self._ffmpeg is not None:
+            self._ffmpeg.stdin.close()
+            if self._ffmpeg.wait() != 0:
+                raise RuntimeError(f"ffmpeg exited with code {self._ffmpeg.returncode}")
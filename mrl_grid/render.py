@@ -1,91 +1,208 @@
 import matplotlib.pyplot as plt
+import matplotlib.colors as mcolors
+from matplotlib.collections import LineCollection
+import numpy as np
 import os
+from time import perf_counter
+import mrl_grid.render_entities as re
+
+TRAIL_POINTS = 8 # points sampled along each curved trail segment
+TRAIL_CHUNK = 256 # trail segments per LineCollection, so only the newest collection is ever updated
+
+def _to_rgba_bytes(color):
+    return np.round(np.array(mcolors.to_rgba(color)) * 255).astype(np.uint8)
 
 class WorldRenderer:
     """
     WorldRenderer renders a multi-agent gridworld instance using Matplotlib.
+
+    The renderer keeps a fixed set of persistent artists: one image holding the walls and seen
+    cells, one LineCollection for the grid lines, LineCollections holding the trail segments in
+    chunks of TRAIL_CHUNK and one circle per agent. Each frame updates those artists in place and
+    redraws them on top of cached backgrounds (blitting): the cells, grid lines and full trail
+    chunks are cached as a layer that is only redrawn when a cell is first seen or a chunk fills
+    up, so most frames just draw the newest trails and the agents. The cost of a frame therefore
+    does not grow as artists pile up over an episode. World entities carry no artists of their own.
     """
 
     def __init__(self, title, world, fps):
+        """
+        Parameters:
+            title (str): the window title.
+            world (World): the world to render.
+            fps (int): frames per second to pace rendering at. If None or 0, frames are drawn without sleeping.
+        """
         aspect_ratio = world.rows / world.cols
         self.fig, self.ax = plt.subplots(figsize=(8 * aspect_ratio, 8))
         plt.subplots_adjust(left=0.05, right=0.95, top=0.95, bottom=0.05)
-        self.world = world
         self.fps = fps
         self.fig.canvas.manager.set_window_title(title)
         self.title = title
-        self.background = None
+        self.frame_time = 0.0 # seconds spent drawing the last frame, without waiting for the frame rate
+        self.background = None # the empty axes
+        self.layer = None # the background with the cells, grid lines and full trail chunks drawn on it
 
         self.ax.set_xticks([])
         self.ax.set_yticks([])
 
-        self.ax.set_xlim(- 0.5, self.world.rows - 0.5)
-        self.ax.set_ylim(self.world.cols - 0.5, - 0.5)
+        # Walls and seen cells, one pixel per grid cell.
+        self.cell_image = self.ax.imshow(
+            np.zeros((world.cols, world.rows, 4), dtype=np.uint8),
+            extent=(-0.5, world.rows - 0.5, world.cols - 0.5, -0.5),
+            interpolation='nearest', zorder=1, animated=True,
+        )
 
-        # Create grid layout.
-        for i in range(self.world.rows):
-            self.ax.axvline(i - 0.5, color='black', linewidth=0.3)
-        for j in range(self.world.cols):
-            self.ax.axhline(j - 0.5, color='black', linewidth=0.3)
+        self.ax.set_xlim(- 0.5, world.rows - 0.5)
+        self.ax.set_ylim(world.cols - 0.5, - 0.5)
+        self.ax.set_aspect('equal', adjustable='box')
+
+        # Create grid layout, drawn over the seen cells.
+        vertical = [[(i - 0.5, -0.5), (i - 0.5, world.cols - 0.5)] for i in range(world.rows)]
+        horizontal = [[(-0.5, j - 0.5), (world.rows - 0.5, j - 0.5)] for j in range(world.cols)]
+        self.grid_lines = LineCollection(vertical + horizontal, colors='black', linewidths=0.3, zorder=2, animated=True)
+        self.ax.add_collection(self.grid_lines, autolim=False)
+
+        self.trail_lines = []
+        self.agent_images = []
+        self.set_world(world)
 
-        # Add the walls to the grid.
-        for wall in self.world.walls:
-            self.ax.add_patch(wall.image)
-    
-        self.last_seen_cell_index = -1
-        self.last_trail_index = -1
+        # Recapture the background whenever the whole figure is redrawn, e.g. after a resize.
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def set_world(self, world):
+        """Render a new world, e.g. after the environment is reset, reusing the figure and artists."""
+        self.world = world
+
+        # RGBA bytes, which Matplotlib draws much faster than float colours.
+        self.cell_colors = np.zeros((world.cols, world.rows, 4), dtype=np.uint8)
+        for wall in world.walls:
+            self.cell_colors[wall.pos] = _to_rgba_bytes(wall.color)
+        self.shown_visited = np.zeros((world.cols, world.rows), dtype=bool)
+        self.agent_cell_colors = np.array([_to_rgba_bytes(agent.color_cell) for agent in world.agents], dtype=np.uint8).reshape(-1, 4)
+        self.cell_image.set_data(self.cell_colors)
+        self.layer = None
+
+        self._clear_trails()
+
+        if len(self.agent_images) != len(world.agents):
+            for agent_image in self.agent_images:
+                agent_image.remove()
+            self.agent_images = []
+            for agent in world.agents:
+                agent_image = re.get_agent_img(agent.color, agent.size)
+                agent_image.set_animated(True)
+                self.ax.add_patch(agent_image)
+                self.agent_images.append(agent_image)
+        for agent, agent_image in zip(world.agents, self.agent_images):
+            agent_image.set_color(agent.color)
 
     def render_static_elements(self):
-        """Render static elements of the world."""
-        # Render new seen_cells.
-        for i, cell in enumerate(self.world.seen_cells[self.last_seen_cell_index + 1:], self.last_seen_cell_index + 1):
-            x, y = cell.pos
-            cell.image.set_xy((y - 0.5, x - 0.5))
-            self.ax.add_patch(cell.image)
-            self.last_seen_cell_index = i
-
-        # Render new trails.
-        for i, trail_segment in enumerate(self.world.trails[self.last_trail_index + 1:], self.last_trail_index + 1):
-            self.ax.add_patch(trail_segment.image)
-            self.last_trail_index = i
-
-        # Save the background (static elements).
-        self.background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+        """Update the seen cells and trails with everything added to the world since the last frame."""
+        # Colour newly seen cells in the colour of the agent that first visited them.
+        visited = self.world.visited_by >= 0
+        changed = visited != self.shown_visited
+        if changed.any():
+            self.cell_colors[changed & ~visited] = 0
+            newly_seen = changed & visited
+            self.cell_colors[newly_seen] = self.agent_cell_colors[self.world.visited_by[newly_seen]]
+            self.shown_visited = visited
+            self.cell_image.set_data(self.cell_colors)
+            self.layer = None
+
+        # Add new trails; start over if the world's trails were replaced, e.g. by a restored state.
+        trails = self.world.trails
+        if trails is not self.trails or self.n_trails > len(trails):
+            self._clear_trails()
+            self.trails = trails
+        new_trails = trails[self.n_trails:]
+        if new_trails:
+            curves = re.get_trail_curves(
+                [trail.old_pos for trail in new_trails],
+                [trail.new_pos for trail in new_trails],
+                [trail.curve_no for trail in new_trails],
+                TRAIL_POINTS,
+            )
+            self._add_trail_segments(list(curves), [trail.color for trail in new_trails])
+            self.n_trails = len(trails)
+
+        # Move agents to their current positions.
+        for agent, agent_image in zip(self.world.agents, self.agent_images):
+            x, y = agent.pos
+            agent_image.center = (y, x)
+
+    def _clear_trails(self):
+        for trail_lines in self.trail_lines:
+            trail_lines.remove()
+        self.trail_lines = []
+        self.trails = None
+        self.n_trails = 0
+        self.n_layered_trail_lines = 0
+        self.layer = None
+
+    def _add_trail_segments(self, segments, colors):
+        """Append trail segments, filling up the newest LineCollection before starting another."""
+        while segments:
+            if not self.trail_lines or len(self.chunk_segments) >= TRAIL_CHUNK:
+                trail_lines = LineCollection([], linewidths=0.4, zorder=2, animated=True)
+                self.ax.add_collection(trail_lines, autolim=False)
+                self.trail_lines.append(trail_lines)
+                self.chunk_segments, self.chunk_colors = [], []
+            room = TRAIL_CHUNK - len(self.chunk_segments)
+            self.chunk_segments.extend(segments[:room])
+            self.chunk_colors.extend(colors[:room])
+            segments, colors = segments[room:], colors[room:]
+            self.trail_lines[-1].set_segments(self.chunk_segments)
+            self.trail_lines[-1].set_color(self.chunk_colors)
+
+    def _draw_frame(self):
+        canvas = self.fig.canvas
+        n_full = len(self.trail_lines)
+        if self.trail_lines and len(self.chunk_segments) < TRAIL_CHUNK:
+            n_full -= 1
+        if self.layer is None or n_full != self.n_layered_trail_lines:
+            canvas.restore_region(self.background)
+            self.ax.draw_artist(self.cell_image)
+            self.ax.draw_artist(self.grid_lines)
+            for trail_lines in self.trail_lines[:n_full]:
+                self.ax.draw_artist(trail_lines)
+            self.layer = canvas.copy_from_bbox(self.fig.bbox)
+            self.n_layered_trail_lines = n_full
+        else:
+            canvas.restore_region(self.layer)
+
+        for trail_lines in self.trail_lines[n_full:]:
+            self.ax.draw_artist(trail_lines)
+        for agent_image in self.agent_images:
+            self.ax.draw_artist(agent_image)
+
+    def _on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self.layer = None
+        self._draw_frame()
 
     def render(self, save_img=False, episode=None):
         """
         Render the world or update the image being shown.
         """
+        start = perf_counter()
         self.render_static_elements()
+        canvas = self.fig.canvas
 
-        # Restore the background (static elements).
-        self.fig.canvas.restore_region(self.background)
-
-        # Add agents to the grid at their current positions.
-        for agent in self.world.agents:
-            x, y = agent.pos
-            agent.image.center = (y, x)
-            self.ax.add_patch(agent.image)
-
-        # Add agents to the grid at their current positions.
-        for agent in self.world.agents:
-            x, y = agent.pos
-            agent.image.center = (y, x)
-            self.ax.add_patch(agent.image)
-            self.ax.draw_artist(agent.image)
-
-
-        self.ax.set_aspect('equal', adjustable='box')
-
-        # Request the window be redrawn.
-        self.fig.canvas.draw_idle()
-        self.fig.canvas.flush_events()
+        if self.background is None:
+            # Draw the static elements once and cache them as the background.
+            canvas.draw()
+        else:
+            self._draw_frame()
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
 
         if save_img:
             self.save_image(episode)
+        self.frame_time = perf_counter() - start
 
-        # Pause for a moment to control the frame rate.
-        plt.pause(1 / self.fps)
+        # Wait for a moment to control the frame rate.
+        if self.fps:
+            canvas.start_event_loop(1 / self.fps)
 
     def save_image(self, episode):
         image_folder = "images"
@@ -94,13 +211,14 @@ class WorldRenderer:
 
         image_name = f"ep{episode}_image.png"
         image_path = os.path.join(image_folder, image_name)
-        plt.savefig(image_path)
+        plt.imsave(image_path, np.asarray(self.fig.canvas.buffer_rgba()))
 
     def render_image(self, episode):
         self.render(save_img=True, episode=episode)
 
     def show(self):
         plt.ion()
+        plt.show(block=False)
 
     def close(self):
-        plt.close()
+        plt.close(self.fig)
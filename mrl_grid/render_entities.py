@@ -1,51 +1,32 @@
 # Description: Contains functions for rendering entities in the grid world.
 
-import matplotlib.pyplot as plt
+import numpy as np
 from matplotlib.patches import Circle
-import matplotlib.path as mpath
-import matplotlib.patches as mpatches
 
 def get_agent_img(color, size, zorder=10):
     img = Circle((0, 0), radius=size, color=color, zorder=zorder)
     return img
 
-def get_seen_cell_img(color, pos, zorder=1):
-    """Returns a matplotlib patch object for a seen cell."""
-    x, y = pos
-    img = plt.Rectangle((x-0.5, y-0.5), 1, 1, facecolor=color, zorder=zorder)
-    return img
-
-def get_wall_img(color, pos):
-    """Returns a matplotlib patch object for a wall."""
-    x, y = pos
-    img = plt.Rectangle((y-0.5, x-0.5), 1, 1, facecolor=color)
-    return img
-
-def get_trail_img(color, old_pos, new_pos, curve_no, zorder=2):
-    """Returns a matplotlib patch object for a trail segment."""
-    old_x, old_y = old_pos
-    new_x, new_y = new_pos
-
-    ctrl_shift = 0.05 * curve_no
-    if old_x == new_x:  # Horizontal movement
-        ctrl_shift *= -1 if old_pos < new_pos else 1
-        ctrl_x1, ctrl_y1 = ((old_y + new_y) / 2, old_x - ctrl_shift)
-        ctrl_x2, ctrl_y2 = ((old_y + new_y) / 2, new_x - ctrl_shift)
-    else:  # Vertical movement
-        ctrl_shift *= -1 if old_pos < new_pos else 1
-        ctrl_x1, ctrl_y1 = (old_y - ctrl_shift, (old_x + new_x) / 2)
-        ctrl_x2, ctrl_y2 = (new_y - ctrl_shift, (old_x + new_x) / 2)
-
-    # Data for the trail curve
-    path_data = [
-        (mpath.Path.MOVETO, (old_y, old_x)),
-        (mpath.Path.CURVE4, (ctrl_x1, ctrl_y1)),
-        (mpath.Path.CURVE4, (ctrl_x2, ctrl_y2)),
-        (mpath.Path.CURVE4, (new_y, new_x)),
-    ]
-
-    codes, verts = zip(*path_data)
-    path = mpath.Path(verts, codes)
-    img = mpatches.PathPatch(path, facecolor='none', edgecolor=color, linewidth=0.4, zorder=zorder)
-
-    return img
+def get_trail_curves(old_pos, new_pos, curve_no, n_points=8):
+    """
+    Returns the points of many trail segments at once, sampled along cubic Bezier curves whose
+    control points are shifted sideways by 0.05 * curve_no, so repeated trails between the same
+    cells stay apart. The result has shape (n_segments, n_points, 2) in plot coordinates.
+    """
+    old_x, old_y = np.asarray(old_pos, dtype=float).reshape(-1, 2).T
+    new_x, new_y = np.asarray(new_pos, dtype=float).reshape(-1, 2).T
+    horizontal = old_x == new_x
+
+    ctrl_shift = 0.05 * np.asarray(curve_no, dtype=float)
+    ctrl_shift *= np.where(np.where(horizontal, old_y < new_y, old_x < new_x), -1, 1)
+    mid_x, mid_y = (old_x + new_x) / 2, (old_y + new_y) / 2
+    ctrl_1 = np.where(horizontal[:, None], np.stack((mid_y, old_x - ctrl_shift), axis=1),
+                      np.stack((old_y - ctrl_shift, mid_x), axis=1))
+    ctrl_2 = np.where(horizontal[:, None], np.stack((mid_y, new_x - ctrl_shift), axis=1),
+                      np.stack((new_y - ctrl_shift, mid_x), axis=1))
+    start = np.stack((old_y, old_x), axis=1)
+    end = np.stack((new_y, new_x), axis=1)
+
+    t = np.linspace(0, 1, n_points)[None, :, None]
+    return ((1 - t) ** 3 * start[:, None] + 3 * (1 - t) ** 2 * t * ctrl_1[:, None]
+            + 3 * (1 - t) * t ** 2 * ctrl_2[:, None] + t ** 3 * end[:, None])
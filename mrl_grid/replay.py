@@ -0,0 +1,57 @@
+# Description: Replays recorded trajectories, either in a Matplotlib window or into a GIF or video
+# file, away from the training process.
+#
+# Usage: python -m mrl_grid.replay trajectory.npz [--episode N] [--output episode.gif]
+
+import argparse
+import multiprocessing as mp
+from mrl_grid.trajectory import Trajectory
+
+def replay(path, episode=0, output=None, fps=None, frame_skip=1, downscale=1):
+    """
+    Replay one episode of a trajectory file.
+
+    Parameters:
+        path (str): the .npz file written by TrajectoryRecorder.
+        episode (int): the index of the episode to replay.
+        output (str): a .gif or video file to export the frames to. If None, the episode is shown
+                      in a window.
+        fps (int): the frame rate to show or export the episode at. If None, the environment's default is used.
+        frame_skip (int): when exporting, keep every frame_skip-th frame.
+        downscale (int): when exporting, the integer factor to shrink frames by.
+    """
+    trajectory = Trajectory(path)
+    env = trajectory.make_env()
+    if fps:
+        env.fps = fps
+    if output:
+        env.start_recording(output, frame_skip=frame_skip, downscale=downscale)
+
+    # when exporting, the recorder captures a frame after the reset and every step
+    for env in trajectory.replay(episode, env):
+        if not output:
+            env.render()
+    env.close()
+
+def replay_in_process(path, episode=0, output=None, **kwargs):
+    """Start replaying an episode in a separate process and return the process."""
+    process = mp.Process(target=replay, args=(path, episode, output), kwargs=kwargs)
+    process.start()
+    return process
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an episode recorded by TrajectoryRecorder.")
+    parser.add_argument("path", help="the .npz trajectory file")
+    parser.add_argument("--episode", type=int, default=0, help="the index of the episode to replay")
+    parser.add_argument("--output", help="export the episode to this .gif or video file instead of showing it")
+    parser.add_argument("--fps", type=int, help="frame rate to show or export the episode at")
+    parser.add_argument("--frame-skip", type=int, default=1, help="when exporting, keep every n-th frame")
+    parser.add_argument("--downscale", type=int, default=1, help="when exporting, shrink frames by this factor")
+    args = parser.parse_args()
+
+    trajectory = Trajectory(args.path)
+    print(f"{args.path}: {trajectory.n_episodes} episodes, {len(trajectory.actions)} steps")
+    replay(args.path, args.episode, args.output, args.fps, args.frame_skip, args.downscale)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# Description: Vectorized reward engine. Reward terms are registered by name, weighted from REWARD_MAP
+# and evaluated for all agents at once from the outcome of their moves.
+
+import numpy as np
+from mrl_grid.reward_functions import REWARD_MAP
+from mrl_grid.world import VISITED_CHANNEL
+
+REWARD_TERMS = {} # registered reward terms by name, in evaluation order
+DEFAULT_REWARD_TERMS = ('illegal', 'collision', 'new', 'goal', 'move', 'wait')
+
+NEIGHBOUR_OFFSETS = np.array([[-1, 0], [1, 0], [0, -1], [0, 1]], dtype=np.intp)
+GATHER_MAX_RADIUS = 3 # up to 7x7, windows are cheaper to gather from the world tensor than to count from the summed-area table
+
+def register_reward_term(name):
+    """
+    Decorator that registers a reward term under the given name. A term is a function
+    term(events, world) that returns an array with one value per agent, which is multiplied by
+    the term's weight (REWARD_MAP[name] unless overridden). Terms are evaluated in the order they
+    were registered.
+    """
+    def decorator(term):
+        REWARD_TERMS[name] = term
+        return term
+    return decorator
+
+class MoveEvents:
+    """
+    Outcome of every agent's move during one step, as arrays indexed by agent.
+
+    Attributes:
+        view_radius (int): The radius of the agent's observation area.
+        exploration_radius (int): The radius of the window the 'exploration' term counts unexplored cells in.
+        old_pos (np.ndarray): Positions before the move, shape (n_agents, 2).
+        new_pos (np.ndarray): Positions after the move, shape (n_agents, 2).
+        illegal (np.ndarray): True for moves outside the grid boundary.
+        collision (np.ndarray): True for moves into a wall or another agent.
+        moved (np.ndarray): True for moves that were carried out.
+        new_cell (np.ndarray): True for moves onto a cell that had not been visited before.
+        goal (np.ndarray): True for the move that earned the goal reward.
+        revisits (np.ndarray): For moves onto a visited cell, the number of times that cell has now been revisited.
+    """
+    def __init__(self, n_agents, view_radius, exploration_radius=None):
+        self.view_radius = view_radius
+        self.exploration_radius = view_radius if exploration_radius is None else exploration_radius
+        self.old_pos = np.zeros((n_agents, 2), dtype=np.intp)
+        self.new_pos = np.zeros((n_agents, 2), dtype=np.intp)
+        self.illegal = np.zeros(n_agents, dtype=bool)
+        self.collision = np.zeros(n_agents, dtype=bool)
+        self.moved = np.zeros(n_agents, dtype=bool)
+        self.new_cell = np.zeros(n_agents, dtype=bool)
+        self.goal = np.zeros(n_agents, dtype=bool)
+        self.revisits = np.zeros(n_agents, dtype=np.int64)
+
+    def clear(self):
+        for array in (self.illegal, self.collision, self.moved, self.new_cell, self.goal, self.revisits):
+            array.fill(0)
+
+class RewardEngine:
+    """
+    Evaluates the enabled reward terms for all agents at once.
+
+    The weighted value of every term is kept in `breakdown`, an array of shape
+    (n_terms, n_agents), and the reward of each agent is the sum of its column, added up in term
+    order. The breakdown of the last step is therefore available at no extra cost.
+
+    Attributes:
+        terms (list[str]): The names of the enabled terms, in evaluation order.
+        weights (np.ndarray): The weight of each enabled term.
+        breakdown (np.ndarray): The weighted term values of the last evaluation.
+    """
+    def __init__(self, terms=DEFAULT_REWARD_TERMS, weights=None):
+        """
+        Parameters:
+            terms (iterable[str]): the names of the registered terms to enable.
+            weights (dict): optional weights by term name that override REWARD_MAP.
+        """
+        unknown = set(terms) - set(REWARD_TERMS)
+        assert not unknown, f"unknown reward terms: {sorted(unknown)}"
+
+        weights = weights or {}
+        self.terms = [name for name in REWARD_TERMS if name in terms]
+        self._functions = [REWARD_TERMS[name] for name in self.terms]
+        self.weights = np.array([weights.get(name, REWARD_MAP[name]) for name in self.terms], dtype=np.float64)
+        self.breakdown = None
+
+    def evaluate(self, events, world):
+        """Return the reward of every agent for the given move events."""
+        n_agents = len(events.moved)
+        self.breakdown = np.empty((len(self.terms), n_agents))
+        reward_n = np.zeros(n_agents)
+        for k, term in enumerate(self._functions):
+            np.multiply(term(events, world), self.weights[k], out=self.breakdown[k])
+            self.breakdown[k] += 0.0 # turn -0.0 from negative weights into 0.0
+            reward_n += self.breakdown[k]
+        return reward_n
+
+    def get_breakdown(self):
+        """Return the weighted value of each enabled term in the last evaluation, by term name."""
+        return dict(zip(self.terms, self.breakdown))
+
+# Reward terms
+# --------------------------------------------------------------------------------------------
+
+@register_reward_term('illegal')
+def illegal_move_term(events, world):
+    """Moving outside the grid boundary."""
+    return events.illegal
+
+@register_reward_term('collision')
+def collision_term(events, world):
+    """Colliding with another agent or a wall."""
+    return events.collision
+
+@register_reward_term('new')
+def new_cell_term(events, world):
+    """Visiting a cell that has not been seen before."""
+    return events.new_cell
+
+@register_reward_term('goal')
+def goal_term(events, world):
+    """Visiting the last unseen cell."""
+    return events.goal
+
+@register_reward_term('revisit')
+def revisit_term(events, world):
+    """Revisiting a cell, growing with the number of times the cell has been revisited."""
+    return events.revisits
+
+@register_reward_term('move')
+def movement_term(events, world):
+    """Moving to another cell."""
+    return events.moved & np.any(events.new_pos != events.old_pos, axis=1)
+
+@register_reward_term('wait')
+def wait_term(events, world):
+    """Staying in the same cell."""
+    return events.moved & np.all(events.new_pos == events.old_pos, axis=1)
+
+@register_reward_term('exploration')
+def exploration_term(events, world):
+    """
+    Moving to a new cell that has more unexplored cells around it than the cell the agent left.
+    Both windows are counted after all agents have moved, so they already include the cells every
+    agent visited this step, the new cell included, rather than the state midway through the step.
+    """
+    # one table query for the cells left and entered
+    unexplored = count_unexplored_cells(world, np.concatenate((events.old_pos, events.new_pos)), events.exploration_radius)
+    old_unexplored, new_unexplored = np.split(unexplored, 2)
+    return events.new_cell & (new_unexplored > old_unexplored)
+
+@register_reward_term('adjacent')
+def adjacent_term(events, world):
+    """Moving to a new cell that is next to a wall, the boundary or a visited cell."""
+    neighbours = events.new_pos[:, None, :] + NEIGHBOUR_OFFSETS[None, :, :]
+    x, y = neighbours[..., 0], neighbours[..., 1]
+    inside = (0 <= x) & (x < world.cols) & (0 <= y) & (y < world.rows)
+    x, y = np.where(inside, x, 0), np.where(inside, y, 0)
+    blocked = ~inside | world.wall_mask[x, y] | (world.visited_by[x, y] >= 0)
+    # the cell the agent came from does not count
+    came_from = np.all(neighbours == events.old_pos[:, None, :], axis=2)
+    return events.new_cell & np.any(blocked & ~came_from, axis=1)
+
+# Helper functions
+# --------------------------------------------------------------------------------------------
+
+def count_unexplored_cells(world, positions, radius):
+    """
+    Count the unvisited cells in the (2 * radius + 1)² window around each position. Cells outside
+    the grid count as unexplored.
+
+    Small windows inside the padding of the world tensor are gathered from its visited channel.
+    Larger windows, of any radius, are counted in O(1) each from the world's summed-area table.
+    """
+    if radius > GATHER_MAX_RADIUS or radius > world.padding:
+        return (2 * radius + 1) ** 2 - world.count_visited(positions, radius)
+    offsets = np.arange(-radius, radius + 1) + world.padding
+    rows = positions[:, 0, None, None] + offsets[None, :, None]
+    cols = positions[:, 1, None, None] + offsets[None, None, :]
+    visited = world.tensor[rows, cols, VISITED_CHANNEL] == 1
+    return (2 * radius + 1) ** 2 - np.count_nonzero(visited, axis=(1, 2))
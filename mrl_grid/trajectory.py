@@ -0,0 +1,160 @@
+# Description: Records the actions taken in a MultiGridEnv into a compressed .npz file, and loads
+# such files to rebuild and replay the episodes deterministically.
+
+import gym
+import numpy as np
+from mrl_grid.custom_envs.grid_env import MultiGridEnv
+
+FORMAT_VERSION = 1
+
+class TrajectoryRecorder(gym.Wrapper):
+    """
+    Wraps a MultiGridEnv and logs everything needed to replay its episodes: the environment's
+    configuration once, then the actions of every step and, optionally, the rewards and done
+    flags. The environment is deterministic, so this is enough to rebuild every World exactly.
+
+    Steps are written into preallocated arrays that grow by doubling, so recording costs a few
+    array assignments per step. The file is written by save(), or by close().
+
+    Attributes:
+        path (str): The .npz file to write.
+        n_steps (int): The number of steps recorded.
+        episode_starts (list[int]): The index of the first step of each episode.
+    """
+    def __init__(self, env, path, record_rewards=True, record_dones=True):
+        """
+        Parameters:
+            env (MultiGridEnv): the environment to record. Wrap it before its first reset.
+            path (str): the .npz file to write.
+            record_rewards (bool): whether to log the centralized reward of every step.
+            record_dones (bool): whether to log the done flag of every step.
+        """
+        super().__init__(env)
+        self.path = path
+        self.record_rewards = record_rewards
+        self.record_dones = record_dones
+
+        capacity = 1024
+        self._actions = np.zeros((capacity, env.n_agents), dtype=np.uint8)
+        self._rewards = np.zeros(capacity, dtype=np.float64)
+        self._dones = np.zeros(capacity, dtype=bool)
+        self.n_steps = 0
+        self.episode_starts = []
+        self.episode_goal_assigned = [] # the goal flag is kept across episodes, so it is logged per episode
+
+    def _start_episode(self):
+        self.episode_starts.append(self.n_steps)
+        self.episode_goal_assigned.append(self.env.goal_reward_assigned)
+
+    def reset(self, **kwargs):
+        self._start_episode()
+        return self.env.reset(**kwargs)
+
+    def step(self, action):
+        if not self.episode_starts:
+            self._start_episode()
+        state, reward, done, info = self.env.step(action)
+
+        t = self.n_steps
+        if t == len(self._actions):
+            self._actions = np.concatenate((self._actions, np.zeros_like(self._actions)))
+            self._rewards = np.concatenate((self._rewards, np.zeros_like(self._rewards)))
+            self._dones = np.concatenate((self._dones, np.zeros_like(self._dones)))
+        self._actions[t] = action
+        self._rewards[t] = reward
+        self._dones[t] = done
+        self.n_steps = t + 1
+        return state, reward, done, info
+
+    def save(self):
+        """Write the recorded trajectory to the .npz file."""
+        env = self.env.unwrapped
+        factor = env.traversal_limit_factor
+        arrays = {
+            'format_version': FORMAT_VERSION,
+            'grid_map': env.grid_map.astype(np.int8),
+            'view_radius': env.view_radius,
+            'exploration_radius': env.exploration_radius,
+            'traversal_limit_factor': np.nan if factor is None else factor,
+            'move_mode': env.move_mode,
+            'test_mode': env.test_mode,
+            'reward_terms': np.array(env.reward_engine.terms, dtype=str),
+            'reward_weights': env.reward_engine.weights,
+            'episode_starts': np.array(self.episode_starts, dtype=np.int64),
+            'episode_goal_assigned': np.array(self.episode_goal_assigned, dtype=bool),
+            'actions': self._actions[:self.n_steps],
+        }
+        if self.record_rewards:
+            arrays['rewards'] = self._rewards[:self.n_steps]
+        if self.record_dones:
+            arrays['dones'] = self._dones[:self.n_steps]
+        np.savez_compressed(self.path, **arrays)
+
+    def close(self):
+        self.save()
+        return self.env.close()
+
+class Trajectory:
+    """
+    A trajectory file written by TrajectoryRecorder.
+
+    Attributes:
+        actions (np.ndarray): The actions of every step, shape (n_steps, n_agents).
+        rewards (np.ndarray): The reward of every step, or None if rewards were not recorded.
+        dones (np.ndarray): The done flag of every step, or None if they were not recorded.
+        episode_starts (np.ndarray): The index of the first step of each episode.
+        n_episodes (int): The number of episodes.
+    """
+    def __init__(self, path):
+        with np.load(path) as data:
+            assert int(data['format_version']) == FORMAT_VERSION, "unsupported trajectory file version"
+            self.grid_map = data['grid_map']
+            self.view_radius = int(data['view_radius'])
+            self.exploration_radius = int(data['exploration_radius']) if 'exploration_radius' in data else None
+            factor = float(data['traversal_limit_factor'])
+            self.traversal_limit_factor = None if np.isnan(factor) else factor
+            self.move_mode = str(data['move_mode'])
+            self.test_mode = bool(data['test_mode'])
+            self.reward_terms = tuple(str(term) for term in data['reward_terms'])
+            self.reward_weights = dict(zip(self.reward_terms, data['reward_weights'].tolist()))
+            self.episode_starts = data['episode_starts']
+            self.episode_goal_assigned = data['episode_goal_assigned']
+            self.actions = data['actions']
+            self.rewards = data['rewards'] if 'rewards' in data else None
+            self.dones = data['dones'] if 'dones' in data else None
+        self.n_episodes = len(self.episode_starts)
+
+    def episode_slice(self, episode):
+        """Return the slice of steps belonging to an episode."""
+        start = self.episode_starts[episode]
+        stop = self.episode_starts[episode + 1] if episode + 1 < self.n_episodes else len(self.actions)
+        return slice(int(start), int(stop))
+
+    def make_env(self):
+        """Build a MultiGridEnv configured like the recorded one."""
+        env = MultiGridEnv(self.grid_map, self.view_radius, self.traversal_limit_factor,
+                           reward_terms=self.reward_terms, reward_weights=self.reward_weights,
+                           move_mode=self.move_mode, exploration_radius=self.exploration_radius)
+        env.test_mode = self.test_mode
+        return env
+
+    def replay(self, episode, env=None):
+        """
+        Rebuild an episode step by step. Yields the environment after the reset and after every
+        step. If rewards were recorded, every replayed reward is checked against them.
+
+        Parameters:
+            episode (int): the index of the episode to replay.
+            env (MultiGridEnv): the environment to replay in. If None, one is built with make_env().
+        """
+        env = env or self.make_env()
+        env.reset()
+        env.goal_reward_assigned = bool(self.episode_goal_assigned[episode])
+        yield env
+
+        steps = self.episode_slice(episode)
+        for t in range(steps.start, steps.stop):
+            _, reward, _, _ = env.step(self.actions[t])
+            if self.rewards is not None and reward != self.rewards[t]:
+                raise ValueError(f"step {t} replayed with reward {reward}, but {self.rewards[t]} was recorded")
+            yield env
@@ -1,4 +1,6 @@
-import mrl_grid.render_entities as re
+import colorsys
+from functools import lru_cache
+import numpy as np
 
 AGENT_COLORS = [
     {
@@ -17,23 +19,160 @@ AGENT_COLORS = [
     'color_trail': '#BA662E',
     },
 ]
+GOLDEN_ANGLE = 0.381966 # hue step, as a fraction of the colour wheel, that keeps generated hues far apart
+
+@lru_cache(maxsize=None)
+def agent_palette(agent_id):
+    """
+    Return the colours of an agent as a dict with 'color', 'color_cell' and 'color_trail'. The
+    first agents use the hand-picked AGENT_COLORS; colours for any further agents are generated by
+    stepping the hue around the colour wheel, so every agent on a map gets distinct colours.
+    """
+    if agent_id < len(AGENT_COLORS):
+        return AGENT_COLORS[agent_id]
+    hue = (agent_id - len(AGENT_COLORS)) * GOLDEN_ANGLE % 1.0
+    def to_hex(saturation, value):
+        return '#' + ''.join(f"{round(c * 255):02x}" for c in colorsys.hsv_to_rgb(hue, saturation, value))
+    return {
+        'color': to_hex(0.9, 0.8),
+        'color_cell': to_hex(0.4, 0.95),
+        'color_trail': to_hex(0.75, 0.7),
+    }
+
+# Position change for each action (up, down, left, right, wait)
+ACTION_DELTAS = np.array([[-1, 0], [1, 0], [0, -1], [0, 1], [0, 0]], dtype=np.intp)
+
+# Channels of the world tensor, in observation order
+SELF_CHANNEL, VISITED_CHANNEL, AGENTS_CHANNEL, WALL_CHANNEL = range(4)
+
+# Adding a visited cell to the summed-area table increments the block below and right of it. Once the
+# blocks of the queued cells add up to this many times the grid, re-accumulating the table is cheaper.
+SAT_REBUILD_RATIO = 4
 
 class World(object):
-    """World object that contains all entities in the environment"""
-    def __init__(self, rows, cols):
+    """
+    World object that contains all entities in the environment.
+
+    Alongside the entity lists the world keeps NumPy grids indexed by cell position so that
+    occupancy queries are O(1) instead of scanning the lists:
+        visited_by (np.ndarray): id of the agent that first visited each cell, -1 if unvisited.
+        revisits (np.ndarray): number of times each visited cell has been revisited.
+        wall_mask (np.ndarray): True for cells that contain a wall.
+        agent_grid (np.ndarray): index in `agents` of the agent occupying each cell, -1 if empty.
+    Per-agent data is kept incrementally in arrays indexed like `agents`:
+        positions (np.ndarray): position of each agent, shape (n_agents, 2).
+        steps_taken (np.ndarray): number of steps taken by each agent.
+        cells_covered (np.ndarray): number of cells first visited by each agent.
+        collided (np.ndarray): True for agents that have collided this episode.
+
+    It also maintains `tensor`, a 4-channel int8 view of the grid (self, visited, agents, wall)
+    padded by `padding` cells of -1 on every side, so observation windows can be cut out of it
+    without bounds checks. The self channel is left at 0 inside the grid and filled in per agent
+    by the observation builder.
+
+    `state_view` is a read-only view of the tensor without its padding, i.e. the full-map state,
+    which follows the world as it changes, including across reset().
+
+    `seen_cells` holds a SeenCell entity per visited cell for the legacy accessors. After `restore()`
+    it is only rebuilt from the visited grid when it is next accessed, so restoring a state copies
+    arrays only; `seen_count` always holds the number of visited cells.
+
+    Visited cells in any rectangular window are counted in O(1) with `count_visited()`, from a
+    summed-area table of the visited grid. Cells are queued as they are visited and folded into
+    the table at the next count, so steps without a count pay nothing for it.
+    """
+    def __init__(self, rows, cols, padding=0):
         self._agents = []
-        self.seen_cells = []
+        self._seen_cells = [] # None after restore() until seen_cells is accessed
+        self.seen_count = 0
         self.trails = []
+        self.edge_trails = {} # trail segments by unordered pair of cells
         self.walls = []
         self.cells = 0
 
         self.rows = rows
         self.cols = cols
+
+        shape = (cols, rows)
+        self.visited_by = np.full(shape, -1, dtype=np.int16)
+        self.revisits = np.zeros(shape, dtype=np.int32)
+        self.wall_mask = np.zeros(shape, dtype=bool)
+        self.agent_grid = np.full(shape, -1, dtype=np.int16)
+        self._cell_index = np.full(shape, -1, dtype=np.int32) # index into seen_cells
+        self._wall_index = np.full(shape, -1, dtype=np.int32) # index into walls
+        self._visited_sat = np.zeros((cols + 1, rows + 1), dtype=np.int32) # summed-area table of visited cells
+        self._sat_pending = [] # cells visited since the table was last brought up to date
+        self._sat_stale = False # whether the table must be rebuilt from visited_by
+
+        self.positions = np.zeros((0, 2), dtype=np.intp)
+        self.steps_taken = np.zeros(0, dtype=np.int64)
+        self.cells_covered = np.zeros(0, dtype=np.int64)
+        self.collided = np.zeros(0, dtype=bool)
+
+        self.padding = padding
+        self.tensor = np.full((cols + 2 * padding, rows + 2 * padding, 4), -1, dtype=np.int8)
+        self.tensor[padding:padding + cols, padding:padding + rows] = 0
+        self.state_view = self.tensor[padding:padding + cols, padding:padding + rows]
+        self.state_view.flags.writeable = False
+
+    @classmethod
+    def from_template(cls, template):
+        "create a freshly initialised world from a compiled map template"
+        world = cls(template.rows, template.cols, padding=template.padding)
+        world.cells = template.cells
+        world.walls = list(template.walls)
+        np.copyto(world.wall_mask, template.wall_mask)
+        np.copyto(world._wall_index, template.wall_index)
+        world.reset(template)
+        return world
+
+    def reset(self, template):
+        """
+        Reinitialise the world in place from the template it was created from. The arrays are
+        refilled rather than replaced, so views of them such as `state_view` stay valid.
+        """
+        np.copyto(self.tensor, template.tensor)
+        self.visited_by.fill(-1)
+        self.revisits.fill(0)
+        self.agent_grid.fill(-1)
+        self._cell_index.fill(-1)
+        self._visited_sat.fill(0)
+        self._sat_pending = []
+        self._sat_stale = False
+        self._agents = []
+        self._seen_cells = []
+        self.seen_count = 0
+        self.trails = []
+        self.edge_trails = {}
+        self._reserve_agents(template.n_agents)
+
+        for agent_id, pos in enumerate(template.agent_cells):
+            agent = Agent(agent_id, pos)
+            self.add_agent(agent)
+            # mark cell on grid as visited
+            self.cell_visited(pos, agent)
         
     @property
     def entities(self):
         "return all entities"
         return self._agents + self.seen_cells + self.trails + self.walls
+
+    @property
+    def seen_cells(self):
+        "return a SeenCell for every visited cell"
+        if self._seen_cells is None:
+            self._build_seen_cells()
+        return self._seen_cells
+
+    def _build_seen_cells(self):
+        "rebuild the seen cells from the visited grid"
+        self._seen_cells = []
+        self._cell_index.fill(-1)
+        for pos in map(tuple, np.argwhere(self.visited_by >= 0).tolist()):
+            cell = SeenCell(pos, self._agents[self.visited_by[pos]])
+            cell.seen_counter = int(self.revisits[pos])
+            self._cell_index[pos] = len(self._seen_cells)
+            self._seen_cells.append(cell)
     
     @property
     def agents(self):
@@ -43,75 +182,301 @@ class World(object):
     @agents.setter
     def agents(self, value):
         self._agents = value
+        self.agent_grid.fill(-1)
+        self._interior[..., AGENTS_CHANNEL] = 0
+        for i, agent in enumerate(self._agents):
+            self.agent_grid[agent.pos] = i
+            self._interior[agent.pos + (AGENTS_CHANNEL,)] += 1
+        self.positions = np.array([agent.pos for agent in value], dtype=np.intp).reshape(-1, 2)
+        self.steps_taken = np.array([agent.steps_taken for agent in value], dtype=np.int64)
+        self.cells_covered = np.array([agent.cells_covered for agent in value], dtype=np.int64)
+        self.collided = np.array([agent.collided for agent in value], dtype=bool)
+
+    def _reserve_agents(self, n_agents):
+        "grow the per-agent arrays to hold at least n_agents"
+        extra = n_agents - len(self.steps_taken)
+        if extra > 0:
+            self.positions = np.concatenate((self.positions, np.zeros((extra, 2), dtype=np.intp)))
+            self.steps_taken = np.concatenate((self.steps_taken, np.zeros(extra, dtype=np.int64)))
+            self.cells_covered = np.concatenate((self.cells_covered, np.zeros(extra, dtype=np.int64)))
+            self.collided = np.concatenate((self.collided, np.zeros(extra, dtype=bool)))
+
+    @property
+    def _interior(self):
+        "unpadded view of the world tensor"
+        p = self.padding
+        return self.tensor[p:p + self.cols, p:p + self.rows]
+
+    def _tensor_index(self, pos, channel):
+        return (pos[0] + self.padding, pos[1] + self.padding, channel)
+
+    def in_bounds(self, pos):
+        "check if position lies inside the grid"
+        x, y = pos
+        return 0 <= x < self.cols and 0 <= y < self.rows
+
+    def add_agent(self, agent):
+        "add agent to the world at its current position"
+        index = len(self._agents)
+        self._reserve_agents(index + 1)
+        self.positions[index] = agent.pos
+        self.steps_taken[index] = agent.steps_taken
+        self.cells_covered[index] = agent.cells_covered
+        self.collided[index] = agent.collided
+        self.agent_grid[agent.pos] = index
+        self.tensor[self._tensor_index(agent.pos, AGENTS_CHANNEL)] += 1
+        self._agents.append(agent)
+
+    def add_wall(self, wall):
+        "add wall to the world"
+        self.wall_mask[wall.pos] = True
+        self._wall_index[wall.pos] = len(self.walls)
+        self.tensor[self._tensor_index(wall.pos, WALL_CHANNEL)] = 1
+        self.walls.append(wall)
+
+    def move_agent(self, agent, new_pos):
+        "move agent to new position and keep the occupancy grid in sync"
+        if agent.pos == new_pos:
+            return
+        index = self.agent_grid[agent.pos]
+        self.agent_grid[agent.pos] = -1
+        self.agent_grid[new_pos] = index
+        self.tensor[self._tensor_index(agent.pos, AGENTS_CHANNEL)] -= 1
+        self.tensor[self._tensor_index(new_pos, AGENTS_CHANNEL)] += 1
+        self.positions[index] = new_pos
+        agent.pos = new_pos
+
+    def move_agents(self, indices, new_positions):
+        "move the agents at the given indices to new positions all at once"
+        if len(indices) == 0:
+            return
+        old_x, old_y = self.positions[indices].T
+        new_x, new_y = np.asarray(new_positions, dtype=np.intp).T
+        p = self.padding
+
+        # vacate every old cell before occupying the new ones so agents can follow each other
+        self.agent_grid[old_x, old_y] = -1
+        np.subtract.at(self.tensor, (old_x + p, old_y + p, AGENTS_CHANNEL), 1)
+        self.agent_grid[new_x, new_y] = indices
+        np.add.at(self.tensor, (new_x + p, new_y + p, AGENTS_CHANNEL), 1)
+        self.positions[indices, 0] = new_x
+        self.positions[indices, 1] = new_y
+
+        for index, pos in zip(indices.tolist(), zip(new_x.tolist(), new_y.tolist())):
+            self._agents[index].pos = pos
+
+    def agent_stepped(self, agent):
+        "count a step taken by agent"
+        agent.steps_taken += 1
+        self.steps_taken[self.agent_grid[agent.pos]] += 1
+
+    def agents_stepped(self):
+        "count a step taken by every agent"
+        for agent in self._agents:
+            agent.steps_taken += 1
+        self.steps_taken += 1
+
+    def set_collided(self, agent):
+        "flag agent as having collided"
+        agent.collided = True
+        self.collided[self.agent_grid[agent.pos]] = True
 
     def cell_visited(self, pos, agent):
         "mark new cell as visited"
-        cell = SeenCell(pos, agent)
-        agent.color_cell = AGENT_COLORS[agent.agent_id]['color_cell']
+        agent.color_cell = agent_palette(agent.agent_id)['color_cell']
         agent.cells_covered += 1
-        self.seen_cells.append(cell)
+        self.cells_covered[self.agent_grid[agent.pos]] += 1
+        self.visited_by[pos] = agent.agent_id
+        self.tensor[self._tensor_index(pos, VISITED_CHANNEL)] = 1
+        self.seen_count += 1
+        if self._seen_cells is not None:
+            self._cell_index[pos] = len(self._seen_cells)
+            self._seen_cells.append(SeenCell(pos, agent))
+        self._sat_pending.append(pos)
+
+    def cell_revisited(self, pos):
+        "count a revisit of a visited cell and return how many times it has been revisited"
+        self.revisits[pos] += 1
+        seen_counter = int(self.revisits[pos])
+        if self._seen_cells is not None:
+            self._seen_cells[self._cell_index[pos]].seen_counter = seen_counter
+        return seen_counter
+
+    def restore(self, positions, visited_by, revisits, steps_taken, cells_covered, collided):
+        "restore the dynamic state of the world from arrays, e.g. an environment state snapshot"
+        for i, agent in enumerate(self._agents):
+            agent.pos = tuple(positions[i].tolist())
+            agent.steps_taken = int(steps_taken[i])
+            agent.cells_covered = int(cells_covered[i])
+            agent.collided = bool(collided[i])
+        np.copyto(self.positions, positions)
+        np.copyto(self.steps_taken, steps_taken)
+        np.copyto(self.cells_covered, cells_covered)
+        np.copyto(self.collided, collided)
+        np.copyto(self.visited_by, visited_by)
+        np.copyto(self.revisits, revisits)
+        self._sat_stale = True
+
+        x, y = self.positions[:, 0], self.positions[:, 1]
+        self.agent_grid.fill(-1)
+        self.agent_grid[x, y] = np.arange(len(self._agents))
+        interior = self._interior
+        interior[..., VISITED_CHANNEL] = self.visited_by >= 0
+        interior[..., AGENTS_CHANNEL] = 0
+        np.add.at(interior, (x, y, AGENTS_CHANNEL), 1)
+
+        # the seen cells are rebuilt from the visited grid when next accessed, trails are not part of the state
+        self.seen_count = int(np.count_nonzero(self.visited_by >= 0))
+        self._seen_cells = None
+        self.trails = []
+        self.edge_trails = {}
 
     def add_trail(self, old_pos, new_pos, agent):
         "add new trail segment"
         if old_pos == new_pos:
             return
 
-        # check if trail already exists 
-        max_curve_trail = max(
-            (trail for trail in self.trails if tuple(sorted((trail.old_pos, trail.new_pos))) == tuple(sorted((old_pos, new_pos)))),
-            key=lambda t: t.curve_no,
-            default=None,
-        )  
-        if max_curve_trail:
-            new_trail = TrailSegment(old_pos, new_pos, agent.agent_id, curve_no=max_curve_trail.curve_no + 1)
-        else:
-            new_trail = TrailSegment(old_pos, new_pos, agent.agent_id, curve_no=0)
+        # trails between the same two cells are curved further apart each time
+        edge = (old_pos, new_pos) if old_pos < new_pos else (new_pos, old_pos)
+        edge_trails = self.edge_trails.setdefault(edge, [])
+        new_trail = TrailSegment(old_pos, new_pos, agent.agent_id, curve_no=len(edge_trails))
 
+        edge_trails.append(new_trail)
         self.trails.append(new_trail)
 
+    def visited_table(self):
+        """
+        Return the summed-area table of the visited grid, of shape (cols + 1, rows + 1): entry
+        [x, y] is the number of visited cells in the block [0, x) x [0, y). Cells visited since the
+        last call are added now.
+        """
+        sat = self._visited_sat
+        pending = self._sat_pending
+        if not self._sat_stale and pending:
+            area = sum((self.cols - x) * (self.rows - y) for x, y in pending)
+            self._sat_stale = area > SAT_REBUILD_RATIO * self.cols * self.rows
+        if self._sat_stale:
+            np.cumsum(self.visited_by >= 0, axis=0, out=sat[1:, 1:])
+            np.cumsum(sat[1:, 1:], axis=1, out=sat[1:, 1:])
+            self._sat_stale = False
+        else:
+            for x, y in pending:
+                sat[x + 1:, y + 1:] += 1
+        pending.clear()
+        return sat
+
+    def count_visited(self, positions, radius):
+        """
+        Count the visited cells in the (2 * radius + 1)² window around each position, four table
+        lookups per window whatever its size. Windows are clipped to the grid.
+
+        Parameters:
+            positions (np.ndarray): window centres, shape (n, 2).
+            radius (int): the radius of the windows, which may exceed the padding of the tensor.
+        """
+        sat = self.visited_table().ravel()
+        positions = np.asarray(positions, dtype=np.intp)
+        size = (self.cols, self.rows)
+        low = np.clip(positions - radius, 0, size)
+        high = np.clip(positions + radius + 1, 0, size)
+        # flat indices into the (cols + 1, rows + 1) table
+        x0, x1 = low[:, 0] * (self.rows + 1), high[:, 0] * (self.rows + 1)
+        y0, y1 = low[:, 1], high[:, 1]
+        return sat[x1 + y1] - sat[x0 + y1] - sat[x1 + y0] + sat[x0 + y0]
+
     def get_coverage(self):
-        total_covered_cells = len(self.seen_cells)
+        total_covered_cells = self.seen_count
         overall_coverage = round((total_covered_cells / self.cells) * 100)
 
-        individual_coverage = {}
-        for agent in self._agents:
-            agent_coverage = round((agent.cells_covered / self.cells) * 100)
-            individual_coverage[agent.agent_id] = agent_coverage
+        agent_coverage = np.round((self.cells_covered / self.cells) * 100).astype(np.int64)
+        individual_coverage = {agent.agent_id: coverage for agent, coverage in zip(self._agents, agent_coverage.tolist())}
 
         return overall_coverage, individual_coverage
 
     def get_steps_taken(self):
-        steps_taken = {}
-        for agent in self._agents:
-            steps_taken[agent.agent_id] = agent.steps_taken
-
-        return steps_taken
+        return {agent.agent_id: steps for agent, steps in zip(self._agents, self.steps_taken.tolist())}
     
     def get_cell(self, pos):
-        for cell in self.seen_cells:
-            if cell.pos == pos:
-                return cell
-        return None
+        if not self.in_bounds(pos):
+            return None
+        seen_cells = self.seen_cells
+        index = self._cell_index[pos]
+        return seen_cells[index] if index >= 0 else None
     
     def check_agent(self, pos):
-        for agent in self._agents:
-            if agent.pos == pos:
-                return agent
-        return None
+        if not self.in_bounds(pos):
+            return None
+        index = self.agent_grid[pos]
+        return self._agents[index] if index >= 0 else None
     
     def check_wall(self, pos):
-        for wall in self.walls:
-            if wall.pos == pos:
-                return wall
-        return None
+        if not self.in_bounds(pos):
+            return None
+        index = self._wall_index[pos]
+        return self.walls[index] if index >= 0 else None
 
     def is_cell_visited(self, pos):
-        return any(cell.pos == pos for cell in self.seen_cells)
+        return self.in_bounds(pos) and self.visited_by[pos] >= 0
 
     def all_cells_visited(self):
-        return len(self.seen_cells) == self.cells
+        return self.seen_count == self.cells
+
+class MapTemplate(object):
+    """
+    Immutable, compiled form of a grid map that worlds are created from.
+
+    The map is parsed once into the wall entities, a read-only wall mask and padded world tensor,
+    the free-cell count and the initial agent positions, so that resetting an environment only
+    copies arrays instead of walking every cell of the map in Python. Agents and walls are listed
+    in the same order the environment has always numbered them: column by column.
+
+    Attributes:
+        rows (int): The size of the grid along the second axis of the map.
+        cols (int): The size of the grid along the first axis of the map.
+        padding (int): The padding of the world tensor.
+        cells (int): The number of cells agents can visit (empty and agent cells).
+        agent_positions (np.ndarray): The initial agent positions, shape (n_agents, 2).
+        agent_cells (tuple): The initial agent positions as tuples.
+        walls (tuple): The wall entities, shared by every world created from the template.
+        wall_mask (np.ndarray): True for cells that contain a wall.
+    """
+    def __init__(self, grid_map, padding=0):
+        grid_map = np.asarray(grid_map)
+        self.cols, self.rows = grid_map.shape
+        self.padding = padding
+        self.cells = int(np.count_nonzero((grid_map == 0) | (grid_map == 1)))
+
+        self.agent_positions = self._scan(grid_map == 1)
+        self.agent_cells = tuple(tuple(pos) for pos in self.agent_positions.tolist())
+        wall_positions = self._scan(grid_map == 2)
+        self.walls = tuple(Wall(tuple(pos)) for pos in wall_positions.tolist())
+
+        self.wall_mask = grid_map == 2
+        self.wall_index = np.full(grid_map.shape, -1, dtype=np.int32)
+        self.wall_index[wall_positions[:, 0], wall_positions[:, 1]] = np.arange(len(wall_positions))
+
+        p = padding
+        self.tensor = np.full((self.cols + 2 * p, self.rows + 2 * p, 4), -1, dtype=np.int8)
+        self.tensor[p:p + self.cols, p:p + self.rows] = 0
+        self.tensor[p:p + self.cols, p:p + self.rows, WALL_CHANNEL] = self.wall_mask
+
+        for array in (self.agent_positions, self.wall_mask, self.wall_index, self.tensor):
+            array.flags.writeable = False
+
+    @property
+    def n_agents(self):
+        return len(self.agent_cells)
+
+    @staticmethod
+    def _scan(mask):
+        "positions of the True cells of mask, ordered column by column"
+        return np.argwhere(mask.T)[:, ::-1].astype(np.intp)
 
 class Entity(object):
+    """
+    Base class for everything placed in the world. Entities only hold data; the matplotlib
+    artists used to draw them are created by `WorldRenderer` once a renderer is attached.
+    """
     def __init__(self):
         self.name = ''
         self.size = 0.050
@@ -128,12 +493,12 @@ class Agent(Entity):
         self.movable = True
         self.action = None
         self.size = 0.3
-        self.color = AGENT_COLORS[self.agent_id]['color']
-        self.color_cell = AGENT_COLORS[self.agent_id]['color_cell']
-        self.color_trail = AGENT_COLORS[self.agent_id]['color_trail']
+        colors = agent_palette(agent_id)
+        self.color = colors['color']
+        self.color_cell = colors['color_cell']
+        self.color_trail = colors['color_trail']
         self.steps_taken = 0
         self.cells_covered = 0
-        self.image = re.get_agent_img(self.color, self.size)
         self.collided = False
 
     def get_new_pos(self, action):
@@ -154,7 +519,6 @@ class SeenCell(Entity):
         self.agent_id = agent.agent_id
         self.color = agent.color_cell
         self.pos = pos
-        self.image = re.get_seen_cell_img(self.color, self.pos)
         self.seen_counter = 0
 
 class TrailSegment(Entity):
@@ -164,13 +528,11 @@ class TrailSegment(Entity):
         self.agent_id = agent_id
         self.new_pos = new_pos
         self.old_pos = old_pos
-        self.color = AGENT_COLORS[agent_id]["color_trail"]
+        self.color = agent_palette(agent_id)["color_trail"]
         self.curve_no = curve_no
-        self.image = re.get_trail_img(self.color, self.old_pos, self.new_pos, self.curve_no)
 
 class Wall(Entity):
     def __init__(self, pos):
         super(Wall, self).__init__()
         self.pos = pos
-        self.color = '#000000'
-        self.image = re.get_wall_img(self.color, self.pos)
\ No newline at end of file
+        self.color = '#000000'
\ No newline at end of file
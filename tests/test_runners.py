@@ -0,0 +1,34 @@
+# Description: Smoke checks that the runners complete and print episodes at every info level.
+
+import json
+import pytest
+import mrl_grid.maps as maps
+from mrl_grid.custom_envs.grid_env import MultiGridEnv, INFO_LEVELS
+from mrl_grid.evaluation_runner import ParallelEvaluationRunner
+from mrl_grid.metrics import MetricsSink
+from mrl_grid.random_action_runner import RandomActionRunner
+
+def make_env(info_level):
+    env = MultiGridEnv(maps.THREE_AGENT_MAPS["16x20 Room1"], 1, info_level=info_level)
+    env.action_space.seed(0)
+    return env
+
+@pytest.mark.parametrize("info_level", INFO_LEVELS)
+def test_random_action_runner(info_level, tmp_path, capsys):
+    env = make_env(info_level)
+    with MetricsSink(str(tmp_path / "episodes.jsonl")) as sink:
+        RandomActionRunner(env, 3, 1, False, metrics=sink).run()
+    env.close()
+
+    assert capsys.readouterr().out.count("Episode:") == 3
+    records = [json.loads(line) for line in open(tmp_path / "episodes.jsonl")]
+    assert [record["episode"] for record in records] == [0, 1, 2]
+
+@pytest.mark.parametrize("info_level", INFO_LEVELS)
+def test_parallel_evaluation_runner(info_level, capsys):
+    env = make_env(info_level)
+    results = ParallelEvaluationRunner(env, 4, n_split=2, n_workers=1, seed=0, max_steps=200).run()
+    env.close()
+
+    assert results.episodes == 4
+    assert capsys.readouterr().out.count("Episode:") == 3 # episodes 0 and 2, and the last one